@@ -1,19 +1,14 @@
 import csv
-import requests
 from xml.etree import ElementTree as ET
 import re
 import time
 import logging
 import json
+import argparse
+import metrics
 
 
-# Logging setup
 LOGFILE = "arxiv_metadata.log"
-logging.basicConfig(
-    filename=LOGFILE,
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s"
-)
 
 INPUT_CSV = "bookmarks.csv"
 OUTPUT_JSON = "output_tags.json"
@@ -29,9 +24,13 @@ def fetch_arxiv_metadata_via_api(arxiv_id):
     Fetch metadata from the arXiv API using the arXiv ID.
     Returns a dictionary with title, tags, abstract, authors, and a formatted locator.
     """
+    import requests
+
     try:
         logging.info(f"Fetching metadata for arXiv ID: {arxiv_id}")
-        response = requests.get(f"{ARXIV_API_URL}{arxiv_id}", timeout=10)
+        with metrics.timer("arxiv_request_seconds"):
+            response = requests.get(f"{ARXIV_API_URL}{arxiv_id}", timeout=10)
+        metrics.count("arxiv_response_bytes_total", len(response.content))
         if response.status_code != 200:
             raise Exception(f"Failed to fetch metadata for {arxiv_id}, HTTP Status: {response.status_code}")
         
@@ -78,6 +77,7 @@ def fetch_arxiv_metadata_via_api(arxiv_id):
             "journal": journal_ref
         }
     except Exception as e:
+        metrics.count("arxiv_errors_total")
         logging.error(f"Error fetching metadata for arXiv ID {arxiv_id}: {e}")
         return {"title": "Error", "tags": [], "abstract": "Error", "authors": []}
 
@@ -103,7 +103,8 @@ def process_csv_with_api(input_csv, output_json):
             arxiv_id = extract_arxiv_id(url)
 
             if arxiv_id:
-                metadata = fetch_arxiv_metadata_via_api(arxiv_id)
+                with metrics.record("arxiv", arxiv_id):
+                    metadata = fetch_arxiv_metadata_via_api(arxiv_id)
                 output_data.append({
                     "resource_name": metadata["title"],
                     "date": metadata["date"],
@@ -121,11 +122,35 @@ def process_csv_with_api(input_csv, output_json):
                 logging.warning(f"Non-arXiv URL encountered: {url}")
         json.dump(output_data, outfile, indent=4)
 
-if __name__ == "__main__":
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch arXiv metadata for the arXiv links in a bookmarks csv.")
+    parser.add_argument(
+        "--input_csv",
+        default=INPUT_CSV,
+        help=f"Path to the input csv file containing urls. Default is '{INPUT_CSV}'."
+    )
+    parser.add_argument(
+        "--output_json",
+        default=OUTPUT_JSON,
+        help=f"Path to the output JSON file. Default is '{OUTPUT_JSON}'."
+    )
+    args = parser.parse_args(argv)
+
+    # Logging setup
+    logging.basicConfig(
+        filename=LOGFILE,
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+
     logging.info("Starting arXiv metadata processing...")
     try:
-        process_csv_with_api(INPUT_CSV, OUTPUT_JSON)
-        logging.info(f"Processing complete. Output saved to {OUTPUT_JSON}.")
+        with metrics.stage("arxiv"):
+            process_csv_with_api(args.input_csv, args.output_json)
+        logging.info(f"Processing complete. Output saved to {args.output_json}.")
     except Exception as e:
         logging.error(f"Unexpected error during processing: {e}")
     logging.info("Process finished.")
+
+if __name__ == "__main__":
+    main()
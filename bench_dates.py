@@ -0,0 +1,93 @@
+import random
+import timeit
+from datetime import datetime
+import argparse
+
+import dates
+
+def legacy_parse_date(date_str):
+    """The strptime trial-and-error parser previously copied in merge_processed.py and process_dates.py."""
+    if not isinstance(date_str, str) or not date_str.strip():
+        return date_str
+    formats = [
+        "%B %d, %Y", "%b %d, %Y", "%B %Y", "%b %Y",
+        "%d %B %Y", "%d %b %Y", "%Y-%m-%d", "%Y-%m", "%Y"
+    ]
+    for fmt in formats:
+        try:
+            return datetime.strptime(date_str, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return date_str
+
+def make_samples(n, seed=0):
+    """
+    A mix resembling the 'date' fields returned by gpt_process.py and the
+    extracted_date fields from process_generic.py: mostly ISO dates and bare years,
+    some month/year strings, a few PDF dates and unparseable leftovers.
+    """
+    rng = random.Random(seed)
+    month_names = ["January", "February", "March", "April", "May", "June", "July",
+                   "August", "September", "October", "November", "December"]
+    generators = [
+        (30, lambda: f"{rng.randint(2015, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"),
+        (20, lambda: str(rng.randint(2010, 2025))),
+        (10, lambda: f"{rng.choice(month_names)} {rng.randint(2018, 2025)}"),
+        (10, lambda: f"{rng.choice(month_names)} {rng.randint(1, 28)}, {rng.randint(2018, 2025)}"),
+        (5, lambda: f"{rng.choice(month_names)[:3]} {rng.randint(1, 28)}, {rng.randint(2018, 2025)}"),
+        (5, lambda: f"{rng.randint(1, 28)} {rng.choice(month_names)} {rng.randint(2018, 2025)}"),
+        (5, lambda: f"{rng.randint(2015, 2025)}-{rng.randint(1, 12):02d}"),
+        (5, lambda: f"D:{rng.randint(2015, 2025)}{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}120000Z"),
+        (10, lambda: rng.choice(["Unknown", "n.d.", "", "Spring 2021", "2023-05-01T12:00:00Z"])),
+    ]
+    weights = [w for w, _ in generators]
+    funcs = [f for _, f in generators]
+    return [rng.choices(funcs, weights)[0]() for _ in range(n)]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark date normalization.")
+    parser.add_argument("--n", type=int, default=20000, help="Number of date strings. Default is 20000.")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions. Default is 5.")
+    args = parser.parse_args(argv)
+
+    samples = make_samples(args.n)
+
+    # Sanity check: the new parser must agree with the old one wherever the old one succeeded
+    for s in set(samples):
+        old, new = legacy_parse_date(s), dates.parse_date(s)
+        if old != s and old != new:
+            raise AssertionError(f"Mismatch for {s!r}: legacy={old!r} new={new!r}")
+
+    def run_legacy():
+        for s in samples:
+            legacy_parse_date(s)
+
+    def run_cold():
+        dates._parse_date_str.cache_clear()
+        for s in samples:
+            dates.parse_date(s)
+
+    def run_warm():
+        for s in samples:
+            dates.parse_date(s)
+
+    def warm_hit_rate():
+        run_cold()
+        before = dates._parse_date_str.cache_info()
+        run_warm()
+        after = dates._parse_date_str.cache_info()
+        return (after.hits - before.hits) / max(1, after.hits + after.misses - before.hits - before.misses)
+
+    results = [
+        ("legacy strptime", min(timeit.repeat(run_legacy, number=1, repeat=args.repeat))),
+        ("regex, cold cache", min(timeit.repeat(run_cold, number=1, repeat=args.repeat))),
+        ("regex, warm cache", min(timeit.repeat(run_warm, number=1, repeat=args.repeat))),
+    ]
+    print(f"{len(samples)} date strings, {len(set(samples))} distinct; "
+          f"warm cache hit rate {warm_hit_rate():.0%} (maxsize {dates._parse_date_str.cache_info().maxsize})")
+    baseline = results[0][1]
+    for name, t in results:
+        print(f"{name:20s} {t * 1e3:8.2f} ms  {t / len(samples) * 1e6:6.2f} us/date  x{baseline / t:.1f}")
+
+if __name__ == "__main__":
+    main()
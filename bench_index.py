@@ -0,0 +1,144 @@
+import os
+import time
+import random
+import tempfile
+import itertools
+import argparse
+import statistics
+
+from bookmark_index import BookmarkIndex
+from tag_vocab import TagVocabulary
+
+COMMON_WORDS = """
+market volatility option pricing portfolio risk neural network transformer attention gradient descent
+stochastic calculus martingale bayesian inference regression kernel graph algorithm compiler rust python
+database index query latency cache memory distributed consensus protocol cryptography proof theorem
+""".split()
+TAGS = ["finance", "math", "blog", "machine learning", "statistics", "programming", "physics",
+        "economics", "databases", "security", "paper", "tutorial", "history", "biology"]
+TYPES = ["HTML", "PDF", "arXiv"]
+
+def make_vocabulary(rng, size=20000):
+    """Common domain words followed by a long tail of rarer pseudo-words, with Zipf-like weights."""
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = COMMON_WORDS + ["".join(rng.choices(letters, k=rng.randint(4, 10))) for _ in range(size)]
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(words))))
+    return words, cum_weights
+
+def make_records(n, seed=0):
+    """Records in the shapes the pipeline writes: gpt_process.py's for HTML/PDF, arxiv.py's for arXiv."""
+    rng = random.Random(seed)
+    words, cum_weights = make_vocabulary(random.Random(0))
+    authors = [f"Author {i}" for i in range(n // 20 + 1)]
+    records = []
+    for i in range(n):
+        type = rng.choice(TYPES)
+        title = " ".join(rng.choices(words, cum_weights=cum_weights, k=6))
+        date = f"{rng.randint(2000, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        record_authors = rng.sample(authors, rng.randint(1, 3))
+        tags = rng.sample(TAGS, rng.randint(1, 4))
+        abstract = " ".join(rng.choices(words, cum_weights=cum_weights, k=rng.randint(40, 120)))
+        if type == "arXiv":
+            records.append({"locator": f"https://arxiv.org/abs/{i}", "resource_name": title, "date": date,
+                            "authors": record_authors, "tags": tags, "abstract": abstract})
+        else:
+            records.append({"url": f"https://example.com/{i}", "type": type, "title": title, "date": date,
+                            "author": record_authors, "tags": tags, "abstract": abstract})
+    return records
+
+def check_author_query(index, records):
+    """Both record shapes must be findable by author."""
+    for shape in ("author", "authors"):
+        record = next(r for r in records if shape in r)
+        url = record.get("url", record.get("locator"))
+        results = index.query(authors=[record[shape][0]], limit=len(index))
+        assert any(r["url"] == url for r in results), f"author query misses a record with '{shape}'"
+
+def check_tag_aliases(index):
+    """Query tags are resolved through the tag vocabulary's aliases and spellings."""
+    expected = index.query(tags=["machine learning"], limit=len(index))
+    assert expected, "no record tagged 'machine learning'"
+    for alias in ("ml", "Machine-Learning"):
+        assert index.query(tags=[alias], limit=len(index)) == expected, f"tag query for {alias!r} differs"
+
+def check_tag_merging():
+    """Fuzzy merging joins typos and plurals, never tags of opposite meaning, and keeps the real spelling."""
+    for a, b in [("unsupervised learning", "supervised learning"), ("nonlinear regression", "linear regression"),
+                 ("asymmetric cryptography", "symmetric cryptography"), ("macroeconomics", "microeconomics")]:
+        vocabulary = TagVocabulary()
+        vocabulary.merge_similar([a, b, b])
+        assert vocabulary.resolve(a) != vocabulary.resolve(b), f"{a!r} merged with {b!r}"
+    for tags, tag, expected in [(["finance", "finanace"], "finanace", "finance"),
+                                (["gnn", "gnn", "graph neural networks"], "gnn", "graph neural networks"),
+                                (["blogs", "blog"], "blogs", "blog")]:
+        vocabulary = TagVocabulary()
+        vocabulary.merge_similar(tags)
+        assert vocabulary.resolve(tag) == expected, f"{tag!r} resolves to {vocabulary.resolve(tag)!r}, not {expected!r}"
+
+def time_query(index, repeat, **kwargs):
+    """Median query time; the first run is excluded since it builds cached impact lists."""
+    index.query(**kwargs)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        index.query(**kwargs)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark BookmarkIndex queries.")
+    parser.add_argument("--n", type=int, default=100000, help="Number of synthetic records. Default is 100000.")
+    parser.add_argument("--repeat", type=int, default=50, help="Repetitions per query. Default is 50.")
+    args = parser.parse_args(argv)
+
+    check_tag_merging()
+    records = make_records(args.n)
+    start = time.perf_counter()
+    index = BookmarkIndex()
+    index.add_records(records)
+    print(f"Indexed {len(index)} records in {time.perf_counter() - start:.2f} s")
+    check_author_query(index, records)
+    check_tag_aliases(index)
+
+    start = time.perf_counter()
+    index.add_records(make_records(100, seed=1))
+    print(f"Incremental update of 100 records in {(time.perf_counter() - start) * 1e3:.2f} ms")
+
+    author = records[0].get("authors", records[0].get("author"))[0]
+    words, _ = make_vocabulary(random.Random(0))
+    queries = {
+        "finance from 2023 by author": dict(tags=["finance"], authors=[author], date_from="2023-01-01", date_to="2023-12-31"),
+        "finance + blog, 2023": dict(tags=["finance", "blog"], date_from="2023-01-01", date_to="2023-12-31"),
+        "any of 3 tags, not paper": dict(any_tags=["math", "physics", "statistics"], exclude_tags=["paper"]),
+        "newest PDFs": dict(type="PDF"),
+        "date range only": dict(date_from="2024-03-01", date_to="2024-03-31"),
+        "text, frequent terms": dict(text="option pricing"),
+        "text, rare terms": dict(text=" ".join(words[1000:1003])),
+        "text + tag + date filters": dict(text="option pricing", tags=["finance"], date_from="2024-01-01"),
+    }
+    print(f"{'query':30s} {'warm':>12s} {'after load':>12s}")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bookmark_index.sqlite")
+        start = time.perf_counter()
+        index.save(path)
+        save_time = time.perf_counter() - start
+        for name, kwargs in queries.items():
+            t = time_query(index, args.repeat, **kwargs)
+            # What one CLI query pays: open the file, then run the query against a cold index
+            start = time.perf_counter()
+            BookmarkIndex.load(path, index.vocabulary).query(**kwargs)
+            cold = time.perf_counter() - start
+            print(f"{name:30s} {t * 1e3:9.3f} ms {cold * 1e3:9.3f} ms")
+
+        print()
+        print(f"Full save {save_time:.2f} s, {os.path.getsize(path) / 2**20:.1f} MB")
+        start = time.perf_counter()
+        loaded = BookmarkIndex.load(path, index.vocabulary)
+        print(f"Load {(time.perf_counter() - start) * 1e3:.2f} ms")
+        start = time.perf_counter()
+        loaded.add_records(make_records(100, seed=2))
+        loaded.save(path)
+        print(f"Update of 100 records and save after load {(time.perf_counter() - start) * 1e3:.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import os
+import sys
+import glob
+import time
+import argparse
+import resource
+import statistics
+import tempfile
+import tracemalloc
+
+import pdf_access
+from generic import PDF_DIR
+from process_generic import PDF_PAGES
+
+# Pages of the synthetic documents used when there is no downloaded corpus
+SYNTHETIC_PAGES = [1, 5, 20, 100, 400]
+
+def rss_mb(field):
+    """VmRSS or VmHWM (peak) of this process in MB, from /proc (Linux only)."""
+    with open("/proc/self/status", "r") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    return None
+
+def reset_peak_rss():
+    """Reset VmHWM so the next reading is the peak of what follows; False where unsupported."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def measure(func, repeat, track_rss):
+    """(median seconds, peak Python heap MB, peak RSS growth MB or None) of func()."""
+    rss = None
+    if track_rss:
+        reset_peak_rss()
+        before = rss_mb("VmRSS")
+    tracemalloc.start()
+    func()
+    heap = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    tracemalloc.stop()
+    if track_rss:
+        rss = max(0.0, rss_mb("VmHWM") - before)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), heap, rss
+
+def synthetic_corpus(directory):
+    import bench_server
+    paths = []
+    for pages in SYNTHETIC_PAGES:
+        path = os.path.join(directory, f"synthetic_{pages}.pdf")
+        with open(path, "wb") as f:
+            f.write(bench_server.make_pdf(pages, pages))
+        paths.append(path)
+    return paths
+
+def legacy_title(path):
+    """What generic.extract_pdf_title did before pdf_access: copy the bytes to temp.pdf and parse it with PyPDF2."""
+    from PyPDF2 import PdfReader
+    with open(path, "rb") as f:
+        content = f.read()
+    temp = os.path.join(tempfile.gettempdir(), "bench_pdf_temp.pdf")
+    with open(temp, "wb") as f:
+        f.write(content)
+    title = PdfReader(temp).metadata.get("/Title", None)
+    os.remove(temp)
+    return title
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark PDF metadata and text extraction per document and backend.")
+    parser.add_argument("--pdf_dir", default=PDF_DIR, help=f"Directory of PDFs. Default is '{PDF_DIR}'.")
+    parser.add_argument("--limit", type=int, default=50, help="Maximum number of documents. Default is 50.")
+    parser.add_argument("--synthetic", action="store_true", help=f"Use generated PDFs of {SYNTHETIC_PAGES} pages instead of pdf_dir.")
+    parser.add_argument("--backends", nargs="+", choices=pdf_access.BACKENDS, help="Backends to compare. Default is every installed one.")
+    parser.add_argument("--pages", type=int, default=PDF_PAGES, help=f"Pages of text extracted per document. Default is {PDF_PAGES}.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions per document. Default is 3.")
+    args = parser.parse_args(argv)
+
+    backends = args.backends or pdf_access.available_backends()
+    track_rss = sys.platform.startswith("linux") and reset_peak_rss()
+
+    workdir = None
+    paths = sorted(glob.glob(os.path.join(args.pdf_dir, "*.pdf")))[:args.limit]
+    if args.synthetic or not paths:
+        if not args.synthetic:
+            print(f"No PDFs in {args.pdf_dir}; using synthetic documents.")
+        workdir = tempfile.mkdtemp(prefix="bench_pdf_")
+        paths = synthetic_corpus(workdir)
+
+    # One warm-up pass, so imports and first-call setup are not charged to the first document
+    for backend in backends:
+        list(pdf_access.page_texts(paths[0], 1, backend))
+
+    columns = [("title, old", None)] + [(f"meta, {b}", b) for b in backends] + [(f"text, {b}", b) for b in backends]
+    times, memory = [], []
+    for path in paths:
+        time_cells, memory_cells = [], []
+        for name, backend in columns:
+            if name == "title, old":
+                func = lambda: legacy_title(path)
+            elif name.startswith("meta"):
+                func = lambda: pdf_access.metadata(path, backend)
+            else:
+                func = lambda: sum(len(t or "") for t in pdf_access.page_texts(path, args.pages, backend))
+            try:
+                seconds, heap, rss = measure(func, args.repeat, track_rss)
+            except Exception as e:
+                time_cells.append(None)
+                memory_cells.append(f"error: {type(e).__name__}")
+                continue
+            time_cells.append(seconds)
+            memory_cells.append(f"{heap:.2f} / {rss:.1f}" if rss is not None else f"{heap:.2f}")
+        label = f"{os.path.basename(path)[:28]:28s} {os.path.getsize(path) / 1024:7.0f}"
+        times.append((label, time_cells))
+        memory.append((label, memory_cells))
+
+    header = f"{'document':28s} {'KB':>7s} " + " ".join(f"{name:>16s}" for name, _ in columns)
+    print(f"Time per document in ms (median of {args.repeat}); text covers the first {args.pages} pages")
+    print(header)
+    for label, cells in times:
+        print(f"{label} " + " ".join(f"{c * 1e3:16.2f}" if c is not None else f"{'error':>16s}" for c in cells))
+    for summary, reduce in (("median", statistics.median), ("total", sum)):
+        values = []
+        for i in range(len(columns)):
+            column = [cells[i] for _, cells in times if cells[i] is not None]
+            values.append(f"{reduce(column) * 1e3:16.2f}" if column else f"{'-':>16s}")
+        print(f"{summary:36s} " + " ".join(values))
+
+    print()
+    print("Peak memory per document in MB: Python heap (tracemalloc)" + (" / RSS growth" if track_rss else ""))
+    print(header)
+    for label, cells in memory:
+        print(f"{label} " + " ".join(f"{c[:16]:>16s}" for c in cells))
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print()
+    print(f"Process peak RSS {peak / 1024:.0f} MB")
+
+    if workdir:
+        for path in paths:
+            os.remove(path)
+        os.rmdir(workdir)
+
+if __name__ == "__main__":
+    main()
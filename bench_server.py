@@ -0,0 +1,190 @@
+import os
+import json
+import time
+import random
+import threading
+import argparse
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_fixtures")
+
+WORDS = """
+volatility option pricing portfolio risk market model stochastic process estimate data variance
+returns strategy trading learning network gradient theorem proof bound algorithm sample error
+distribution probability expected value measure convergence rate simulation monte carlo fourier
+""".split()
+
+ROBOTS_TXT = "User-agent: *\nDisallow: /private/\n"
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURE_DIR, name), "r", encoding="utf-8") as f:
+        return f.read()
+
+def make_text(n_words, seed):
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(n_words))
+
+def make_html(size_kb, seed):
+    """HTML page of roughly size_kb kilobytes built from the page.html fixture."""
+    template = load_fixture("page.html")
+    rng = random.Random(seed)
+    paragraphs = []
+    size = len(template)
+    while size < size_kb * 1024:
+        paragraph = f"<p>{make_text(rng.randint(60, 120), rng.random())}</p>\n"
+        paragraphs.append(paragraph)
+        size += len(paragraph)
+    return template.format(
+        title=f"Post {seed}: notes on {rng.choice(WORDS)} {rng.choice(WORDS)}",
+        author="Jane Doe",
+        date="2024-03-01",
+        body="".join(paragraphs),
+    ).encode("utf-8")
+
+def pdf_string(text):
+    return "(" + text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
+
+def make_pdf(pages, seed, words_per_page=400):
+    """Valid PDF with an Info dictionary and pages of extractable text."""
+    objects = []
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    font = add("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = len(objects) + 1 + 2 * pages  # filled in after the pages
+    page_ids = []
+    for n in range(pages):
+        words = make_text(words_per_page, f"{seed}-{n}").split()
+        lines = [" ".join(words[i:i + 12]) for i in range(0, len(words), 12)]
+        stream = "BT /F1 10 Tf 50 780 Td 12 TL\n" + "\n".join(f"{pdf_string(line)} '" for line in lines) + "\nET"
+        content = add(f"<< /Length {len(stream.encode('latin-1'))} >>\nstream\n{stream}\nendstream")
+        page_ids.append(add(
+            f"<< /Type /Page /Parent {pages_id} 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 {font} 0 R >> >> /Contents {content} 0 R >>"
+        ))
+    kids = " ".join(f"{i} 0 R" for i in page_ids)
+    assert add(f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>") == pages_id
+    catalog = add(f"<< /Type /Catalog /Pages {pages_id} 0 R >>")
+    info = add(
+        f"<< /Title {pdf_string(f'Working paper {seed}')} /Author (Jane Doe) "
+        f"/CreationDate (D:20230615120000Z) >>"
+    )
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode("latin-1")
+    out += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root {catalog} 0 R /Info {info} 0 R >>\n"
+        f"startxref\n{xref}\n%%EOF\n"
+    ).encode("latin-1")
+    return bytes(out)
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Routes:
+      GET  /arxiv?id_list=<id>        recorded arXiv Atom feed for <id>
+      GET  /html/<size_kb>/<n>        HTML page of about size_kb kilobytes
+      GET  /pdf/<pages>/<n>           PDF with the given number of pages
+      GET  /status/<code>/<n>         empty response with the given HTTP status
+      GET  /robots.txt                robots.txt disallowing /private/
+      POST /v1/chat/completions       recorded chat completion, with optional 429s
+    """
+    config = None  # set by start_server
+
+    def log_message(self, format, *args):
+        pass
+
+    def send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = url.path.strip("/").split("/")
+        time.sleep(self.config["fetch_latency"])
+        try:
+            if parts[0] == "arxiv":
+                arxiv_id = parse_qs(url.query).get("id_list", [""])[0]
+                body = self.server.atom_template.replace("{arxiv_id}", arxiv_id).encode("utf-8")
+                self.send(200, body, "application/atom+xml; charset=utf-8")
+            elif parts[0] == "html":
+                self.send(200, make_html(int(parts[1]), int(parts[2])), "text/html; charset=utf-8")
+            elif parts[0] == "pdf":
+                self.send(200, make_pdf(int(parts[1]), int(parts[2])), "application/pdf")
+            elif parts[0] == "status":
+                self.send(int(parts[1]), b"", "text/plain")
+            elif parts[0] == "robots.txt":
+                self.send(200, ROBOTS_TXT.encode("utf-8"), "text/plain")
+            else:
+                self.send(404, b"not found", "text/plain")
+        except (IndexError, ValueError):
+            self.send(400, b"bad request", "text/plain")
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if self.path.rstrip("/").endswith("/chat/completions"):
+            time.sleep(self.config["chat_latency"])
+            with self.server.lock:
+                throttle = self.server.rng.random() < self.config["rate_limit"]
+            if throttle:
+                body = json.dumps({"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}})
+                self.send(429, body.encode("utf-8"), "application/json", {"Retry-After": "0"})
+                return
+            response = json.loads(self.server.completion)
+            prompt = "".join(m.get("content", "") for m in request.get("messages", []))
+            response["usage"]["prompt_tokens"] = len(prompt) // 4
+            response["usage"]["total_tokens"] = response["usage"]["prompt_tokens"] + response["usage"]["completion_tokens"]
+            self.send(200, json.dumps(response).encode("utf-8"), "application/json")
+        else:
+            self.send(404, b"not found", "text/plain")
+
+def start_server(port=0, fetch_latency=0.0, chat_latency=0.0, rate_limit=0.0, seed=0):
+    """
+    Start the stub server on a background thread.
+    rate_limit is the fraction of chat completion requests answered with 429.
+    Returns (server, base_url); call server.shutdown() to stop it.
+    """
+    handler = type("ConfiguredStubHandler", (StubHandler,), {"config": {
+        "fetch_latency": fetch_latency,
+        "chat_latency": chat_latency,
+        "rate_limit": rate_limit,
+    }})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    server.atom_template = load_fixture("arxiv_atom.xml")
+    server.completion = load_fixture("chat_completion.json")
+    server.rng = random.Random(seed)
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve recorded arXiv, web and OpenAI responses locally.")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on. Default is 8765.")
+    parser.add_argument("--fetch_latency", type=float, default=0.0, help="Seconds added to every GET. Default is 0.")
+    parser.add_argument("--chat_latency", type=float, default=0.0, help="Seconds added to every chat completion. Default is 0.")
+    parser.add_argument("--rate_limit", type=float, default=0.0, help="Fraction of chat completions answered with 429. Default is 0.")
+    args = parser.parse_args()
+
+    server, base_url = start_server(args.port, args.fetch_latency, args.chat_latency, args.rate_limit)
+    print(f"Stub server listening on {base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
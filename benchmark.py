@@ -0,0 +1,245 @@
+import os
+import sys
+import csv
+import json
+import time
+import shutil
+import platform
+import resource
+import tempfile
+import argparse
+import subprocess
+from datetime import datetime, timezone
+
+import bench_server
+
+RESULTS_JSON = "bench_results.json"
+STAGES = ["arxiv", "generic", "process_generic", "gpt_process"]
+
+# Corpus mix for the download and extraction stages: (kind, size) where size is
+# kilobytes for HTML and pages for PDF
+CORPUS = [("html", 5), ("html", 50), ("html", 500), ("pdf", 1), ("pdf", 10), ("pdf", 50)]
+
+def percentile(values, p):
+    """Nearest-rank percentile of values, p in [0, 100]."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * p // 100))  # ceil
+    return ordered[int(rank) - 1]
+
+def timed(func, latencies):
+    """Wrap func so the duration of every call is appended to latencies."""
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - start)
+    return wrapper
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+def write_csv(path, urls):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["url"])
+        writer.writerows([url] for url in urls)
+
+def corpus_item(i):
+    kind, size = CORPUS[i % len(CORPUS)]
+    return kind, size
+
+# --- stage runners; each runs inside a fresh worker process in an empty working directory ---
+
+def run_arxiv(base_url, n, latencies):
+    import arxiv
+    arxiv.ARXIV_API_URL = f"{base_url}/arxiv?id_list="
+    arxiv.DELAY = 0  # the real run sleeps to respect arXiv's rate limits
+    arxiv.fetch_arxiv_metadata_via_api = timed(arxiv.fetch_arxiv_metadata_via_api, latencies)
+    write_csv("bookmarks.csv", [f"https://arxiv.org/abs/2306.{i:05d}" for i in range(n)])
+    arxiv.process_csv_with_api("bookmarks.csv", "output_tags.json")
+
+def run_generic(base_url, n, latencies):
+    import generic
+    generic.download_resource = timed(generic.download_resource, latencies)
+    urls = []
+    for i in range(n):
+        kind, size = corpus_item(i)
+        urls.append(f"{base_url}/{kind}/{size}/{i}")
+    write_csv("bookmarks.csv", urls)
+    generic.process_urls("bookmarks.csv", "download_log.csv", "non_arxiv_output.json")
+
+def run_process_generic(base_url, n, latencies):
+    import process_generic
+    os.makedirs("corpus", exist_ok=True)
+    resources = []
+    for i in range(n):
+        kind, size = corpus_item(i)
+        path = os.path.join("corpus", f"{i}.{kind}")
+        with open(path, "wb") as f:
+            f.write(bench_server.make_html(size, i) if kind == "html" else bench_server.make_pdf(size, i))
+        resources.append({"url": f"{base_url}/{kind}/{size}/{i}", "type": kind.upper(), "uuid": f"{i}.{kind}", "local_file": path})
+    with open("non_arxiv_output.json", "w", encoding="utf-8") as f:
+        json.dump(resources, f)
+    process_generic.process_resource = timed(process_generic.process_resource, latencies)
+    process_generic.extract_resources("non_arxiv_output.json", "resources_extracted.json")
+
+def run_gpt_process(base_url, n, latencies):
+    os.environ["OPENAI_BASE_URL"] = f"{base_url}/v1"
+    os.environ["OPENAI_API_KEY"] = "benchmark"
+    import gpt_process
+    os.makedirs("segments", exist_ok=True)
+    os.makedirs("processed", exist_ok=True)
+    os.makedirs(gpt_process.LOG_DIR, exist_ok=True)
+    text = bench_server.make_text(2000, 0)
+    records = [{
+        "url": f"{base_url}/html/50/{i}",
+        "type": "HTML",
+        "uuid": f"{i}.html",
+        "title": f"Post {i}",
+        "extracted_title": f"Post {i}",
+        "extracted_author": "Jane Doe",
+        "extracted_date": "2024-03-01",
+        "extracted_text": text,
+    } for i in range(n)]
+    with open(os.path.join("segments", "segment_1.json"), "w", encoding="utf-8") as f:
+        json.dump(records, f)
+    gpt_process.INPUT_DIR = "segments"
+    gpt_process.OUTPUT_DIR = "processed"
+    gpt_process.transform_json_object = timed(gpt_process.transform_json_object, latencies)
+    gpt_process.process_json_file("segment_1.json", "segment_1.json", "benchmark.log")
+
+RUNNERS = {
+    "arxiv": run_arxiv,
+    "generic": run_generic,
+    "process_generic": run_process_generic,
+    "gpt_process": run_gpt_process,
+}
+
+def worker(stage, base_url, n, repo_dir):
+    """Run one stage and print its metrics as JSON on the last line of stdout."""
+    sys.path.insert(0, repo_dir)
+    latencies = []
+    start = time.perf_counter()
+    RUNNERS[stage](base_url, n, latencies)
+    elapsed = time.perf_counter() - start
+    import metrics
+    print(json.dumps({
+        "records": n,
+        "calls": len(latencies),
+        "seconds": round(elapsed, 4),
+        "records_per_sec": round(n / elapsed, 3) if elapsed else None,
+        "p50_ms": round(percentile(latencies, 50) * 1e3, 3) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1e3, 3) if latencies else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "metrics": metrics.snapshot(),
+    }))
+
+def run_stage(stage, base_url, n, keep_workdir=False):
+    """Run a stage in a subprocess, so peak RSS is measured per stage, and return its metrics."""
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    workdir = tempfile.mkdtemp(prefix=f"bench_{stage}_")
+    try:
+        proc = subprocess.run(
+            [sys.executable, os.path.join(repo_dir, "benchmark.py"), "--worker", stage,
+             "--base_url", base_url, "--records", str(n), "--repo_dir", repo_dir],
+            cwd=workdir, capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            return {"records": n, "error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit code {proc.returncode}"}
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+    finally:
+        if keep_workdir:
+            print(f"{stage} working directory kept at {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+def compare(results, baseline, tolerance):
+    """List of human-readable regressions of results against baseline."""
+    regressions = []
+    for stage, current in results["stages"].items():
+        previous = baseline.get("stages", {}).get(stage)
+        if not previous or "error" in previous:
+            continue
+        if "error" in current:
+            regressions.append(f"{stage}: failed ({current['error']})")
+            continue
+        checks = [
+            ("records_per_sec", lambda old, new: new < old * (1 - tolerance)),
+            ("p99_ms", lambda old, new: new > old * (1 + tolerance)),
+            ("peak_rss_mb", lambda old, new: new > old * (1 + tolerance)),
+        ]
+        for metric, regressed in checks:
+            old, new = previous.get(metric), current.get(metric)
+            if old is not None and new is not None and regressed(old, new):
+                regressions.append(f"{stage}: {metric} {old} -> {new}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages against a local stub server.")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES, help="Stages to run. Default is all.")
+    parser.add_argument("--records", type=int, default=60, help="Records per stage. Default is 60.")
+    parser.add_argument("--fetch_latency", type=float, default=0.0, help="Seconds added to every stub GET. Default is 0.")
+    parser.add_argument("--chat_latency", type=float, default=0.05, help="Seconds added to every chat completion. Default is 0.05.")
+    parser.add_argument("--rate_limit", type=float, default=0.0, help="Fraction of chat completions answered with 429. Default is 0.")
+    parser.add_argument("--output", default=RESULTS_JSON, help=f"Path of the results file. Default is '{RESULTS_JSON}'.")
+    parser.add_argument("--baseline", help="Previous results file to check for regressions.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression. Default is 0.2.")
+    parser.add_argument("--keep_workdir", action="store_true", help="Keep each stage's working directory for inspection.")
+    parser.add_argument("--worker", choices=STAGES, help=argparse.SUPPRESS)
+    parser.add_argument("--base_url", help=argparse.SUPPRESS)
+    parser.add_argument("--repo_dir", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        worker(args.worker, args.base_url, args.records, args.repo_dir)
+        return
+
+    server, base_url = bench_server.start_server(
+        fetch_latency=args.fetch_latency, chat_latency=args.chat_latency, rate_limit=args.rate_limit
+    )
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "records": args.records,
+            "fetch_latency": args.fetch_latency,
+            "chat_latency": args.chat_latency,
+            "rate_limit": args.rate_limit,
+        },
+        "stages": {},
+    }
+    try:
+        for stage in args.stages:
+            metrics = run_stage(stage, base_url, args.records, args.keep_workdir)
+            results["stages"][stage] = metrics
+            if "error" in metrics:
+                print(f"{stage:16s} FAILED: {metrics['error']}")
+            else:
+                print(
+                    f"{stage:16s} {metrics['records_per_sec']:9.2f} rec/s  p50 {metrics['p50_ms']} ms  "
+                    f"p99 {metrics['p99_ms']} ms  peak RSS {metrics['peak_rss_mb']} MB"
+                )
+    finally:
+        server.shutdown()
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
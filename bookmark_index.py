@@ -0,0 +1,813 @@
+import os
+import re
+import sys
+import json
+import math
+import bisect
+import heapq
+import sqlite3
+import argparse
+from array import array
+from operator import itemgetter
+from collections import Counter
+from dates import parse_date
+from tag_vocab import TagVocabulary, VOCABULARY_FILE
+
+INDEX_FILE = "bookmark_index.sqlite"
+NON_ARXIV_JSON = "merged_normalized_tags.json"
+ARXIV_JSON = "output_tags_clean.json"
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+ISO_PREFIX = re.compile(r"\d{4}-\d{2}-\d{2}")
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the this to was were which with we our
+""".split())
+
+# Candidate sets up to this size are materialized and filtered directly
+SELECTIVE = 2000
+EMPTY = frozenset()
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+# The term-frequency part of BM25 is stored as an integer, in steps of 1 / IMPACT_SCALE
+IMPACT_SCALE = 1000
+
+def tokenize(text):
+    """Lowercase word tokens with stopwords and single characters removed."""
+    if not isinstance(text, str):
+        return []
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if len(t) > 1 and t not in STOPWORDS]
+
+def impact(tf, length, avg_length):
+    """The term-frequency part of a token's BM25 score in a document of length tokens, without idf."""
+    norm = tf + K1 * (1 - B + B * length / avg_length)
+    return max(1, round(IMPACT_SCALE * tf * (K1 + 1) / norm))
+
+def idf(df, n):
+    return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+def pack_impacts(word_ids, impacts):
+    """Bytes of a document's word ids (array('I')) followed by their impacts (array('H')), little-endian."""
+    if sys.byteorder == "big":
+        word_ids, impacts = array("I", word_ids), array("H", impacts)
+        word_ids.byteswap()
+        impacts.byteswap()
+    return word_ids.tobytes() + impacts.tobytes()
+
+def unpack_impacts(blob):
+    """{word id: impact} from pack_impacts()."""
+    split = len(blob) // 6 * 4
+    word_ids, impacts = array("I"), array("H")
+    word_ids.frombytes(blob[:split])
+    impacts.frombytes(blob[split:])
+    if sys.byteorder == "big":
+        word_ids.byteswap()
+        impacts.byteswap()
+    return dict(zip(word_ids, impacts))
+
+def as_list(value):
+    if value is None or value == "":
+        return []
+    return value if isinstance(value, list) else [value]
+
+def index_date(value):
+    """Normalize a date to YYYY-MM-DD for range queries, or None if it cannot be normalized."""
+    value = parse_date(value)
+    if isinstance(value, str) and ISO_PREFIX.match(value):
+        return value[:10]
+    return None
+
+def normalize_record(entry):
+    """
+    Map both record shapes onto one: the gpt-processed non-arXiv records
+    (url, type, title, date, author, tags, tag_ids, abstract) and the arXiv records
+    from arxiv.py (locator, resource_name, date, authors, tags, tag_ids, abstract, journal).
+    """
+    if "locator" in entry and "url" not in entry:
+        record = {
+            "url": entry["locator"],
+            "type": "arXiv",
+            "title": entry.get("resource_name", ""),
+            "date": entry.get("date", ""),
+            "authors": as_list(entry.get("authors")),
+            "tags": as_list(entry.get("tags")),
+            "abstract": entry.get("abstract", ""),
+        }
+        if entry.get("tag_ids") is not None:
+            record["tag_ids"] = entry["tag_ids"]
+        if entry.get("journal"):
+            record["journal"] = entry["journal"]
+        if entry.get("categories"):
+            record["categories"] = entry["categories"]
+        return record
+    record = dict(entry)
+    # gpt_process.py returns the authors under 'author'
+    record["authors"] = as_list(record.pop("author", None) if "authors" not in record else record["authors"])
+    record["tags"] = as_list(record.get("tags"))
+    return record
+
+# Text postings are stored twice: per word in impact order (impacts), so a query reads only
+# the top of each word's list, and per document (doc_words) for scoring given documents
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (id INTEGER PRIMARY KEY, url TEXT NOT NULL UNIQUE, date TEXT);
+CREATE INDEX IF NOT EXISTS docs_date ON docs (date);
+CREATE TABLE IF NOT EXISTS records (id INTEGER PRIMARY KEY, record TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS tags (key INTEGER NOT NULL, doc INTEGER NOT NULL, PRIMARY KEY (key, doc)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS authors (key TEXT NOT NULL, doc INTEGER NOT NULL, PRIMARY KEY (key, doc)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS types (key TEXT NOT NULL, doc INTEGER NOT NULL, PRIMARY KEY (key, doc)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS words (id INTEGER PRIMARY KEY, key TEXT NOT NULL UNIQUE, df INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS impacts (word INTEGER NOT NULL, impact INTEGER NOT NULL, doc INTEGER NOT NULL, PRIMARY KEY (word, impact, doc)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS doc_words (doc INTEGER PRIMARY KEY, impacts BLOB NOT NULL);
+CREATE TABLE IF NOT EXISTS stats (key TEXT PRIMARY KEY, value REAL NOT NULL);
+"""
+TABLES = ("docs", "records", "tags", "authors", "types", "words", "impacts", "doc_words", "stats")
+
+class StoredPostings(dict):
+    """
+    {key: postings} that reads a key's postings from the index database the
+    first time it is looked up, so a query only reads the keys it touches.
+    """
+
+    def __init__(self, fetch):
+        super().__init__()
+        self._fetch = fetch  # key -> postings, or None if the key is not stored
+        self._absent = set()
+
+    def _read(self, key):
+        if key in self._absent:
+            return None
+        value = self._fetch(key)
+        if value is None:
+            self._absent.add(key)
+        else:
+            dict.__setitem__(self, key, value)
+        return value
+
+    def __missing__(self, key):
+        value = self._read(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or self._read(key) is not None
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def forget(self, keys):
+        """Drop cached keys whose stored postings changed, so the next lookup reads them again."""
+        for key in keys:
+            self.pop(key, None)
+            self._absent.discard(key)
+
+class StoredList(dict):
+    """
+    A per-document list of a loaded index (records, dates, word impacts): doc id -> value,
+    read from the index database on first access.
+    """
+
+    def __init__(self, fetch, count):
+        super().__init__()
+        self._fetch = fetch
+        self._count = count
+
+    def __missing__(self, doc_id):
+        if not 0 <= doc_id < self._count:
+            raise IndexError(doc_id)
+        record = self[doc_id] = self._fetch(doc_id)
+        return record
+
+    def __len__(self):
+        return self._count
+
+    def append(self, record):
+        self[self._count] = record
+        self._count += 1
+
+class BookmarkIndex:
+    """
+    Inverted index over the final bookmark records.
+
+    Tag ids, authors and types map to sets of document ids, dates are kept in a
+    sorted list for range queries, and title/abstract tokens map to
+    {doc id: term frequency} for BM25-ranked full-text search. Tag ids come from
+    the tag vocabulary, whose aliases also resolve the tags in a query, so "ml"
+    finds the records tagged "machine learning".
+    Records are keyed by url, so adding a record with a known url replaces it.
+
+    The index is saved to SQLite. Once loaded from or saved to a file, records,
+    postings and dates are read from it as queries touch them, date ranges are
+    read through its docs_date index, and updates are written to it directly, so
+    save() only has to commit them. The file keeps each token's BM25 term-frequency
+    parts (impacts) in descending order, computed with the average document length
+    of the last full save, so a text query reads only the top of each list.
+    """
+
+    def __init__(self, vocabulary=None):
+        self.vocabulary = vocabulary if vocabulary is not None else TagVocabulary()
+        self.records = []
+        self.url_to_id = {}
+        self.tags = {}
+        self.authors = {}
+        self.types = {}
+        self.terms = {}  # token -> {doc id: term frequency}; words and doc_words replace it once backed by a file
+        self.doc_lengths = []
+        self.doc_dates = []
+        self.sorted_dates = []  # sorted list of (date, doc id); None when loaded, as the docs_date index serves date ranges
+        self.total_length = 0
+        self.words = None  # token -> (word id, document frequency), once backed by a file
+        self.doc_words = None  # doc id -> {word id: impact}, once backed by a file
+        self.avg_length = None  # average document length the stored impacts were computed with
+        self._impacts = {}  # token -> [(BM25 contribution, doc id)], best first; built on demand
+        self._db = None  # connection to the backing file, once loaded or saved
+        self._path = None
+
+    def __len__(self):
+        return len(self.records)
+
+    # --- building ---
+
+    def add_records(self, entries):
+        """Insert or update records. Returns the number of records that were new or changed."""
+        changed = 0
+        added, removed = set(), set()  # (date, doc id) pairs, applied to sorted_dates once per batch
+        for entry in entries:
+            record = normalize_record(entry)
+            url = record.get("url")
+            if not url:
+                continue
+            # Records from normalize_tags.py and process_json_tags.py carry their tag ids
+            if record.get("tag_ids") is None:
+                record["tag_ids"] = [self.vocabulary.intern(t) for t in record["tags"]]
+            doc_id = self.url_to_id.get(url)
+            if doc_id is not None:
+                if self.records[doc_id] == record:
+                    continue
+                old = (self.doc_dates[doc_id], doc_id)
+                if old[0]:
+                    if old in added:
+                        added.discard(old)
+                    else:
+                        removed.add(old)
+                self._unindex(doc_id)
+                self.records[doc_id] = record
+            else:
+                doc_id = len(self.records)
+                self.url_to_id[url] = doc_id
+                self.records.append(record)
+                self.doc_dates.append(None)
+                if self._db is None:
+                    self.doc_lengths.append(0)
+                else:
+                    self.doc_words.append(None)
+            self._index(doc_id)
+            if self.doc_dates[doc_id]:
+                added.add((self.doc_dates[doc_id], doc_id))
+            changed += 1
+        if self.sorted_dates is not None:
+            if removed:
+                self.sorted_dates = [pair for pair in self.sorted_dates if pair not in removed]
+            if added:
+                self.sorted_dates.extend(added)
+                self.sorted_dates.sort()
+        if changed:
+            self._impacts.clear()
+        return changed
+
+    def _postings(self, record):
+        tags = set(record["tag_ids"])
+        authors = {str(a).lower() for a in record["authors"]}
+        tokens = tokenize(record.get("title")) + tokenize(record.get("abstract"))
+        return tags, authors, tokens
+
+    def _index(self, doc_id):
+        record = self.records[doc_id]
+        tags, authors, tokens = self._postings(record)
+        counts = Counter(tokens)
+        type = str(record.get("type", "")).lower()
+        self.doc_dates[doc_id] = index_date(record.get("date"))
+        if self._db is not None:
+            self._store(doc_id, record, tags, authors, type, counts)
+            return
+        self.doc_lengths[doc_id] = len(tokens)
+        self.total_length += len(tokens)
+        for tag in tags:
+            self.tags.setdefault(tag, set()).add(doc_id)
+        for author in authors:
+            self.authors.setdefault(author, set()).add(doc_id)
+        self.types.setdefault(type, set()).add(doc_id)
+        for token, tf in counts.items():
+            self.terms.setdefault(token, {})[doc_id] = tf
+
+    def _unindex(self, doc_id):
+        record = self.records[doc_id]
+        tags, authors, tokens = self._postings(record)
+        type = str(record.get("type", "")).lower()
+        self.doc_dates[doc_id] = None
+        if self._db is not None:
+            self._unstore(doc_id, tags, authors, type, set(tokens))
+            return
+        self.total_length -= self.doc_lengths[doc_id]
+        for field, keys in ((self.tags, tags), (self.authors, authors), (self.types, [type])):
+            for key in keys:
+                field[key].discard(doc_id)
+                if not field[key]:
+                    del field[key]
+        for token in set(tokens):
+            del self.terms[token][doc_id]
+            if not self.terms[token]:
+                del self.terms[token]
+
+    def _store(self, doc_id, record, tags, authors, type, counts):
+        """Write one document's rows to the backing file; they are committed by the next save()."""
+        db = self._db
+        db.execute("INSERT OR REPLACE INTO docs VALUES (?, ?, ?)", (doc_id, record["url"], self.doc_dates[doc_id]))
+        db.execute("INSERT OR REPLACE INTO records VALUES (?, ?)", (doc_id, json.dumps(record, ensure_ascii=False)))
+        for table, field, keys in (("tags", self.tags, tags), ("authors", self.authors, authors),
+                                   ("types", self.types, [type])):
+            db.executemany(f"INSERT INTO {table} VALUES (?, ?)", [(key, doc_id) for key in keys])
+            field.forget(keys)
+        length = sum(counts.values())
+        if not self.avg_length:
+            # An index saved without any text takes its average length from its first document
+            self.avg_length = length or 1
+        word_ids, impacts = array("I"), array("H")
+        for token, tf in counts.items():
+            word = self.words.get(token)
+            word_ids.append(word[0] if word else db.execute("INSERT INTO words (key, df) VALUES (?, 0)", (token,)).lastrowid)
+            impacts.append(impact(tf, length, self.avg_length))
+        db.executemany("UPDATE words SET df = df + 1 WHERE id = ?", [(w,) for w in word_ids])
+        db.executemany("INSERT INTO impacts VALUES (?, ?, ?)", [(w, i, doc_id) for w, i in zip(word_ids, impacts)])
+        db.execute("INSERT OR REPLACE INTO doc_words VALUES (?, ?)", (doc_id, pack_impacts(word_ids, impacts)))
+        self.words.forget(counts)
+        self.doc_words.pop(doc_id, None)
+
+    def _unstore(self, doc_id, tags, authors, type, tokens):
+        db = self._db
+        for table, field, keys in (("tags", self.tags, tags), ("authors", self.authors, authors),
+                                   ("types", self.types, [type])):
+            db.executemany(f"DELETE FROM {table} WHERE key = ? AND doc = ?", [(key, doc_id) for key in keys])
+            field.forget(keys)
+        impacts = self.doc_words[doc_id]
+        db.executemany("DELETE FROM impacts WHERE word = ? AND impact = ? AND doc = ?",
+                       [(w, i, doc_id) for w, i in impacts.items()])
+        db.executemany("UPDATE words SET df = df - 1 WHERE id = ?", [(w,) for w in impacts])
+        self.words.forget(tokens)
+
+    # --- querying ---
+
+    def query(self, tags=None, any_tags=None, exclude_tags=None, authors=None, type=None,
+              date_from=None, date_to=None, text=None, limit=20):
+        """
+        Boolean/range query, optionally ranked by full-text relevance.
+        - tags: all of these tags; any_tags: at least one; exclude_tags: none of these
+        - authors: all of these authors (case-insensitive exact names)
+        - type: resource type, e.g. 'HTML', 'PDF' or 'arXiv'
+        - date_from, date_to: inclusive YYYY-MM-DD bounds (prefixes such as '2023' work for date_from)
+        - text: free-text query over titles and abstracts, ranked with BM25
+        Returns a list of records, best matches first when text is given, newest first otherwise.
+        """
+        if limit <= 0:
+            return []
+        required = [self._tag_docs(t) for t in tags or []]
+        required += [self.authors.get(a.lower(), EMPTY) for a in authors or []]
+        if type:
+            required.append(self.types.get(type.lower(), EMPTY))
+        required.sort(key=len)
+        any_sets = [self._tag_docs(t) for t in any_tags or []]
+        excluded = [self._tag_docs(t) for t in exclude_tags or []]
+        if (required and not required[0]) or (any_tags and not any(any_sets)):
+            return []
+
+        def matches(doc_id, check_dates=True):
+            if any(doc_id not in s for s in required):
+                return False
+            if any_sets and not any(doc_id in s for s in any_sets):
+                return False
+            if any(doc_id in s for s in excluded):
+                return False
+            if check_dates and (date_from or date_to):
+                date = self.doc_dates[doc_id]
+                if not date or (date_from and date < date_from) or (date_to and date > date_to):
+                    return False
+            return True
+
+        # Materialize candidates when a selective posting set or date range bounds them, or when
+        # both bound a text query: ranking then scores the intersection of the smaller side with
+        # the other directly instead of reading deep into the impact lists. Otherwise stream
+        # through the term postings or the dates.
+        dated = self._date_count(date_from, date_to) if date_from or date_to else None
+        candidates = None
+        if required and dated is not None and (text or min(len(required[0]), dated) <= SELECTIVE):
+            if len(required[0]) <= dated:
+                candidates = [d for d in required[0] if matches(d)]
+            else:
+                dated_required = required[0].intersection(self._dated(date_from, date_to))
+                candidates = [d for d in dated_required if matches(d, check_dates=False)]
+        elif required and len(required[0]) <= SELECTIVE:
+            candidates = [d for d in required[0] if matches(d)]
+        elif dated is not None and dated <= SELECTIVE:
+            candidates = [d for d in self._dated(date_from, date_to) if matches(d, check_dates=False)]
+
+        if text:
+            filtered = required or any_sets or excluded or date_from or date_to
+            ranked = self._search(tokenize(text), candidates, matches if filtered else None, limit)
+        elif candidates is not None:
+            ranked = heapq.nlargest(limit, candidates, key=lambda d: self.doc_dates[d] or "")
+        else:
+            ranked = self._newest(matches, date_from, date_to, limit)
+        return [self.records[d] for d in ranked]
+
+    def _tag_docs(self, tag):
+        """Documents tagged with tag or with the canonical tag it is an alias of."""
+        tag_id = self.vocabulary.ids.get(self.vocabulary.resolve(tag))
+        return EMPTY if tag_id is None else self.tags.get(tag_id, EMPTY)
+
+    def _date_bounds(self, date_from, date_to):
+        """Slice of sorted_dates within the inclusive date range."""
+        lo = bisect.bisect_left(self.sorted_dates, (date_from,)) if date_from else 0
+        # (date_to, inf) sorts after every (date_to, doc id), so date_to is inclusive
+        hi = bisect.bisect_right(self.sorted_dates, (date_to, math.inf)) if date_to else len(self.sorted_dates)
+        return lo, hi
+
+    def _date_where(self, date_from, date_to):
+        """SQL condition on docs for the inclusive date range, and its parameters."""
+        conditions, params = ["date IS NOT NULL"], []
+        if date_from:
+            conditions.append("date >= ?")
+            params.append(date_from)
+        if date_to:
+            conditions.append("date <= ?")
+            params.append(date_to)
+        return " AND ".join(conditions), params
+
+    def _date_count(self, date_from, date_to):
+        """Number of documents dated within the inclusive range."""
+        if self.sorted_dates is not None:
+            lo, hi = self._date_bounds(date_from, date_to)
+            return hi - lo
+        where, params = self._date_where(date_from, date_to)
+        return self._db.execute(f"SELECT count(*) FROM docs WHERE {where}", params).fetchone()[0]
+
+    def _dated(self, date_from, date_to, newest_first=False):
+        """Ids of the documents dated within the inclusive range, oldest first (or newest first), read lazily."""
+        if self.sorted_dates is not None:
+            lo, hi = self._date_bounds(date_from, date_to)
+            if newest_first:
+                return (self.sorted_dates[i][1] for i in range(hi - 1, lo - 1, -1))
+            return map(itemgetter(1), self.sorted_dates[lo:hi])
+        where, params = self._date_where(date_from, date_to)
+        order = "DESC" if newest_first else "ASC"
+        cursor = self._db.execute(f"SELECT id FROM docs WHERE {where} ORDER BY date {order}, id {order}", params)
+        return (doc_id for doc_id, in cursor)
+
+    def _undated(self):
+        """Ids of the documents without a date."""
+        if self.sorted_dates is not None:
+            return (doc_id for doc_id in range(len(self)) if not self.doc_dates[doc_id])
+        return (doc_id for doc_id, in self._db.execute("SELECT id FROM docs WHERE date IS NULL ORDER BY id"))
+
+    def _newest(self, matches, date_from, date_to, limit):
+        """Walk the documents dated within the range from newest to oldest, collecting up to limit matching documents."""
+        ranked = []
+        for doc_id in self._dated(date_from, date_to, newest_first=True):
+            if matches(doc_id, check_dates=False):
+                ranked.append(doc_id)
+                if len(ranked) == limit:
+                    return ranked
+        if not (date_from or date_to):
+            # Undated documents come last
+            for doc_id in self._undated():
+                if len(ranked) == limit:
+                    break
+                if matches(doc_id, check_dates=False):
+                    ranked.append(doc_id)
+        return ranked
+
+    def _impact_list(self, token):
+        """Postings of token as (BM25 contribution, doc id), highest first. Cached until the next update."""
+        impacts = self._impacts.get(token)
+        if impacts is None:
+            postings = self.terms.get(token, {})
+            n = len(self)
+            avg_length = self.total_length / n if n else 0
+            weight = idf(len(postings), n)
+            impacts = sorted(((weight * impact(tf, self.doc_lengths[d], avg_length), d) for d, tf in postings.items()),
+                             reverse=True)
+            self._impacts[token] = impacts
+        return impacts
+
+    def _search(self, tokens, candidates, matches, limit):
+        """
+        Top documents by BM25 score over tokens.
+        Small candidate lists are scored exhaustively. Otherwise the impact-ordered
+        postings are read in lockstep (Fagin's threshold algorithm), stopping once
+        no unseen document can beat the current top results.
+        """
+        if self._db is not None:
+            return self._search_stored(tokens, candidates, matches, limit)
+        tokens = [t for t in set(tokens) if t in self.terms]
+        if not tokens:
+            return []
+        n = len(self)
+        avg_length = self.total_length / n
+        idfs = {t: idf(len(self.terms[t]), n) for t in tokens}
+
+        def score(doc_id):
+            total = 0.0
+            for t in tokens:
+                tf = self.terms[t].get(doc_id)
+                if tf:
+                    total += idfs[t] * impact(tf, self.doc_lengths[doc_id], avg_length)
+            return total
+
+        if candidates is not None:
+            scores = {d: score(d) for d in candidates}
+            return heapq.nlargest(limit, (d for d in scores if scores[d] > 0), key=scores.get)
+
+        lists = [self._impact_list(t) for t in tokens]
+        top = []  # min-heap of (score, doc id)
+        seen = set()
+        depth = 0
+        while True:
+            threshold = 0.0
+            exhausted = True
+            for impacts in lists:
+                if depth >= len(impacts):
+                    continue
+                exhausted = False
+                contribution, doc_id = impacts[depth]
+                threshold += contribution
+                if doc_id in seen:
+                    continue
+                seen.add(doc_id)
+                if matches is None or matches(doc_id):
+                    entry = (score(doc_id), doc_id)
+                    if len(top) < limit:
+                        heapq.heappush(top, entry)
+                    elif entry > top[0]:
+                        heapq.heapreplace(top, entry)
+            if exhausted or (len(top) == limit and top[0][0] >= threshold):
+                break
+            depth += 1
+        return [d for _, d in sorted(top, reverse=True)]
+
+    def _search_stored(self, tokens, candidates, matches, limit):
+        """
+        _search() against the backing file, with impacts computed at save time.
+        Candidate lists are scored from their doc_words rows. Otherwise each word's
+        impacts are read best first, in batches that double in size, adding up the
+        contributions seen so far (Fagin's NRA). The current top documents are scored
+        in full from doc_words, which raises the bar quickly. A document not yet read
+        in a list can gain at most that list's last impact, so once no unread document
+        can reach the top, the few read ones that still could are scored in full too.
+        """
+        words = [self.words.get(t) for t in set(tokens)]
+        n = len(self)
+        idfs = {word_id: idf(df, n) for word_id, df in filter(None, words) if df > 0}
+        if not idfs:
+            return []
+
+        def contributions(doc_id):
+            impacts = self.doc_words[doc_id]
+            return {w: weight * impacts[w] for w, weight in idfs.items() if w in impacts}
+
+        if candidates is not None:
+            scores = {d: sum(contributions(d).values()) for d in candidates}
+            return heapq.nlargest(limit, (d for d in scores if scores[d] > 0), key=scores.get)
+
+        cursors = {w: self._db.execute("SELECT impact, doc FROM impacts WHERE word = ? ORDER BY impact DESC, doc DESC", (w,))
+                   for w in idfs}
+        floors = dict.fromkeys(idfs, math.inf)  # word -> highest contribution an unread posting can have
+        partial = {}  # doc id -> {word: contribution} of the matching documents read so far
+        lower = {}  # doc id -> sum of its known contributions
+        complete = set()  # documents whose contributions are all known
+        rejected = set()
+
+        def score_fully(doc_id):
+            partial[doc_id] = contributions(doc_id)
+            lower[doc_id] = sum(partial[doc_id].values())
+            complete.add(doc_id)
+
+        batch = max(limit, 64)
+        while True:
+            for w, cursor in list(cursors.items()):
+                rows = cursor.fetchmany(batch)
+                weight = idfs[w]
+                for value, doc_id in rows:
+                    if doc_id in complete or doc_id in rejected:
+                        continue
+                    found = partial.get(doc_id)
+                    if found is None:
+                        if matches is not None and not matches(doc_id):
+                            rejected.add(doc_id)
+                            continue
+                        found = partial[doc_id] = {}
+                        lower[doc_id] = 0.0
+                    found[w] = weight * value
+                    lower[doc_id] += found[w]
+                if len(rows) < batch:
+                    del cursors[w]
+                    floors[w] = 0.0
+                else:
+                    floors[w] = weight * rows[-1][0]
+            for d in heapq.nlargest(limit, lower, key=lower.get):
+                if d not in complete:
+                    score_fully(d)
+            top = heapq.nlargest(limit, lower, key=lower.get)
+            kth = lower[top[-1]] if len(top) == limit else 0.0
+            unread = sum(floors.values())
+            if not cursors or kth >= unread:
+                # No unread document can reach the top; score the read ones that still could
+                uncertain = [d for d in partial if d not in complete and lower[d] + unread > kth and lower[d] + sum(
+                    floor for w, floor in floors.items() if w not in partial[d]) > kth]
+                if not cursors or len(uncertain) <= batch:
+                    for d in uncertain:
+                        score_fully(d)
+                    return heapq.nlargest(limit, lower, key=lower.get)
+            batch *= 2
+
+    # --- persistence ---
+
+    def save(self, path):
+        """
+        Write the index to a SQLite file. For the file the index was loaded from
+        or last saved to, this commits the updates made since. Saving a loaded
+        index under another name commits them to its own file and copies that.
+        """
+        if self._db is None:
+            self._save_all(path)
+            return
+        self._store_stats(self._db)
+        self._db.commit()
+        if os.path.abspath(path) != os.path.abspath(self._path):
+            target = sqlite3.connect(path)
+            self._db.backup(target)
+            self._db.close()
+            self._attach(target, path)
+
+    def _save_all(self, path):
+        """Write every document and posting, in key order so the B-trees are filled sequentially."""
+        db = sqlite3.connect(path)
+        # Queries can read the file while an update holds uncommitted changes
+        db.execute("PRAGMA journal_mode = WAL")
+        n = len(self)
+        self.avg_length = self.total_length / n if n else 0.0
+        with db:
+            db.executescript(SCHEMA)
+            for table in TABLES:
+                db.execute(f"DELETE FROM {table}")
+            db.executemany("INSERT INTO docs VALUES (?, ?, ?)",
+                           ((i, self.records[i]["url"], self.doc_dates[i]) for i in range(n)))
+            db.executemany("INSERT INTO records VALUES (?, ?)",
+                           ((i, json.dumps(record, ensure_ascii=False)) for i, record in enumerate(self.records)))
+            for table, field in (("tags", self.tags), ("authors", self.authors), ("types", self.types)):
+                db.executemany(f"INSERT INTO {table} VALUES (?, ?)",
+                               ((key, doc) for key in sorted(field) for doc in sorted(field[key])))
+            keys = sorted(self.terms)
+            db.executemany("INSERT INTO words VALUES (?, ?, ?)",
+                           ((word_id, key, len(self.terms[key])) for word_id, key in enumerate(keys)))
+            forward_words, forward_impacts = [array("I") for _ in range(n)], [array("H") for _ in range(n)]
+
+            def impact_rows():
+                for word_id, key in enumerate(keys):
+                    postings = sorted((impact(tf, self.doc_lengths[d], self.avg_length), d)
+                                      for d, tf in self.terms[key].items())
+                    for value, doc in postings:
+                        forward_words[doc].append(word_id)
+                        forward_impacts[doc].append(value)
+                        yield word_id, value, doc
+
+            db.executemany("INSERT INTO impacts VALUES (?, ?, ?)", impact_rows())
+            db.executemany("INSERT INTO doc_words VALUES (?, ?)",
+                           ((d, pack_impacts(forward_words[d], forward_impacts[d])) for d in range(n)))
+            self._store_stats(db)
+        self._attach(db, path)
+
+    def _store_stats(self, db):
+        db.execute("INSERT OR REPLACE INTO stats VALUES ('avg_length', ?)", (self.avg_length or 0.0,))
+
+    def _attach(self, db, path):
+        """Serve records, postings and dates from db from now on, reading each key when it is first used."""
+        self._db, self._path = db, path
+        count = db.execute("SELECT coalesce(max(id) + 1, 0) FROM docs").fetchone()[0]
+        row = db.execute("SELECT value FROM stats WHERE key = 'avg_length'").fetchone()
+        self.avg_length = row[0] if row else 0.0
+
+        def fetch_record(doc_id):
+            return json.loads(db.execute("SELECT record FROM records WHERE id = ?", (doc_id,)).fetchone()[0])
+
+        def fetch_date(doc_id):
+            return db.execute("SELECT date FROM docs WHERE id = ?", (doc_id,)).fetchone()[0]
+
+        def fetch_doc_words(doc_id):
+            return unpack_impacts(db.execute("SELECT impacts FROM doc_words WHERE doc = ?", (doc_id,)).fetchone()[0])
+
+        def fetch_doc_id(url):
+            row = db.execute("SELECT id FROM docs WHERE url = ?", (url,)).fetchone()
+            return row[0] if row else None
+
+        def fetch_docs(table):
+            def fetch(key):
+                docs = {doc for doc, in db.execute(f"SELECT doc FROM {table} WHERE key = ?", (key,))}
+                return docs or None
+            return fetch
+
+        def fetch_word(key):
+            return db.execute("SELECT id, df FROM words WHERE key = ?", (key,)).fetchone()
+
+        self.records = StoredList(fetch_record, count)
+        self.doc_dates = StoredList(fetch_date, count)
+        self.doc_words = StoredList(fetch_doc_words, count)
+        self.url_to_id = StoredPostings(fetch_doc_id)
+        self.tags = StoredPostings(fetch_docs("tags"))
+        self.authors = StoredPostings(fetch_docs("authors"))
+        self.types = StoredPostings(fetch_docs("types"))
+        self.words = StoredPostings(fetch_word)
+        # The in-memory text postings are replaced by words and doc_words
+        self.terms, self.doc_lengths, self.total_length = None, None, None
+        self._impacts.clear()
+
+    @classmethod
+    def load(cls, path, vocabulary=None):
+        """
+        Open an index written by save(). Nothing but the number of documents and their
+        average length is read up front. vocabulary must be the one the records' tag
+        ids were assigned from.
+        """
+        db = sqlite3.connect(path)
+        if not db.execute("SELECT 1 FROM sqlite_master WHERE name = 'impacts'").fetchone():
+            db.close()
+            raise ValueError(f"{path} was written by an older version of bookmark_index.py; delete it and run update again")
+        index = cls(vocabulary)
+        index.sorted_dates = None
+        index._attach(db, path)
+        return index
+
+def load_or_create(path, vocabulary=None):
+    return BookmarkIndex.load(path, vocabulary) if os.path.exists(path) else BookmarkIndex(vocabulary)
+
+def update_index(index_file, json_files, vocabulary_file=VOCABULARY_FILE):
+    """Add the records from json_files to the index at index_file, creating it if needed."""
+    vocabulary = TagVocabulary.load(vocabulary_file)
+    known_tags = len(vocabulary)
+    index = load_or_create(index_file, vocabulary)
+    changed = 0
+    for json_file in json_files:
+        with open(json_file, "r", encoding="utf-8") as f:
+            changed += index.add_records(json.load(f))
+    if changed:
+        index.save(index_file)
+    # Tags of records without tag_ids were interned; keep their ids for the next run
+    if len(vocabulary) > known_tags:
+        vocabulary.save(vocabulary_file)
+    return index, changed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and query the bookmark index.")
+    parser.add_argument("--index", default=INDEX_FILE, help=f"Path to the index file. Default is '{INDEX_FILE}'.")
+    parser.add_argument(
+        "--vocabulary",
+        default=VOCABULARY_FILE,
+        help=f"Tag vocabulary the records' tag ids come from. Default is '{VOCABULARY_FILE}'."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    update_parser = subparsers.add_parser("update", help="Add new or changed records to the index.")
+    update_parser.add_argument(
+        "json_files",
+        nargs="*",
+        default=[NON_ARXIV_JSON, ARXIV_JSON],
+        help=f"JSON record files. Default is '{NON_ARXIV_JSON}' and '{ARXIV_JSON}'."
+    )
+
+    query_parser = subparsers.add_parser("query", help="Query the index.")
+    query_parser.add_argument("text", nargs="?", help="Free-text query over titles and abstracts.")
+    query_parser.add_argument("--tag", action="append", dest="tags", help="Required tag (repeatable).")
+    query_parser.add_argument("--any_tag", action="append", dest="any_tags", help="At least one of these tags (repeatable).")
+    query_parser.add_argument("--exclude_tag", action="append", dest="exclude_tags", help="Excluded tag (repeatable).")
+    query_parser.add_argument("--author", action="append", dest="authors", help="Required author (repeatable).")
+    query_parser.add_argument("--type", help="Resource type: HTML, PDF or arXiv.")
+    query_parser.add_argument("--date_from", help="Earliest date, YYYY-MM-DD.")
+    query_parser.add_argument("--date_to", help="Latest date, YYYY-MM-DD.")
+    query_parser.add_argument("--limit", type=int, default=20, help="Maximum number of results. Default is 20.")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "update":
+        index, changed = update_index(args.index, args.json_files, args.vocabulary)
+        print(f"{changed} records added or updated; index has {len(index)} records.")
+    else:
+        index = BookmarkIndex.load(args.index, TagVocabulary.load(args.vocabulary))
+        results = index.query(
+            tags=args.tags, any_tags=args.any_tags, exclude_tags=args.exclude_tags,
+            authors=args.authors, type=args.type, date_from=args.date_from,
+            date_to=args.date_to, text=args.text, limit=args.limit
+        )
+        for record in results:
+            print(f"{record.get('date', '')}\t{record.get('title', '')}\t{record['url']}")
+
+if __name__ == "__main__":
+    main()
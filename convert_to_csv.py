@@ -1,5 +1,6 @@
 import csv
 import json
+import argparse
 
 # Function to flatten JSON objects with nested lists/dictionaries
 def flatten_json(json_obj, parent_key='', sep='_'):
@@ -19,32 +20,117 @@ def flatten_json(json_obj, parent_key='', sep='_'):
             items.append((new_key, value))
     return dict(items)
 
-# Function to convert JSON to CSV
-def json_to_csv(json_data, csv_file_path):
-    """Convert a list of JSON objects to a CSV file."""
-    # Flatten all JSON objects
-    flattened_data = [flatten_json(item) for item in json_data]
+# Desired order of headers, shared by the CSV and Parquet outputs
+HEADERS = ["url", "type", "title", "date", "authors", "tags", "abstract"]
+LIST_COLUMNS = ["authors", "tags"]
 
-    # Define the desired order of headers
-    headers = ["url", "type", "title", "date", "authors", "tags", "abstract"]
+JSON_FILE = "merged_normalized_tags.json"
+CSV_FILE = "gappy_non_arxiv.csv"
+PARQUET_FILE = "gappy_non_arxiv.parquet"
 
-    # Write to CSV
+def with_authors(item):
+    """gpt_process.py returns the authors under 'author'; arxiv.py under 'authors'."""
+    if "authors" not in item and "author" in item:
+        item = dict(item)
+        item["authors"] = item.pop("author")
+    return item
+
+# Function to convert JSON to CSV
+def json_to_csv(json_data, csv_file_path):
+    """Convert a list of JSON objects to a CSV file, flattening one record at a time."""
     with open(csv_file_path, mode='w', newline='', encoding='utf-8') as csv_file:
-        writer = csv.DictWriter(csv_file, fieldnames=headers, extrasaction='ignore')
+        writer = csv.DictWriter(csv_file, fieldnames=HEADERS, extrasaction='ignore')
         writer.writeheader()
-        writer.writerows(flattened_data)
+        for item in json_data:
+            writer.writerow(flatten_json(with_authors(item)))
 
-# Example usage
-if __name__ == "__main__":
-    # Replace 'example.json' with the path to your JSON file
-    json_file_path = "merged_normalized_tags.json"
-    csv_file_path = "gappy_non_arxiv.csv"
+def as_list(value):
+    """Coerce an authors/tags value to a list of strings (GPT sometimes returns a plain string)."""
+    if value is None or value == "":
+        return []
+    if isinstance(value, list):
+        return [str(v) for v in value]
+    return [str(value)]
+
+def as_str(value):
+    return None if value is None else str(value)
+
+def json_to_parquet(json_data, parquet_file_path, row_group_size=10000, compression="zstd"):
+    """
+    Convert a list of JSON objects to a Parquet file.
+    Unlike the CSV view, authors and tags are kept as list<string> columns.
+    Records are sorted by date so that per-row-group min/max statistics
+    let readers skip row groups when filtering on date.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema(
+        [(name, pa.list_(pa.string()) if name in LIST_COLUMNS else pa.string()) for name in HEADERS]
+    )
+    records = sorted((with_authors(item) for item in json_data), key=lambda item: str(item.get("date") or ""))
+    columns = {
+        name: [as_list(item.get(name)) if name in LIST_COLUMNS else as_str(item.get(name)) for item in records]
+        for name in HEADERS
+    }
+    table = pa.Table.from_pydict(columns, schema=schema)
+    pq.write_table(
+        table,
+        parquet_file_path,
+        row_group_size=row_group_size,
+        compression=compression,
+        write_statistics=True,
+    )
+
+def read_parquet(parquet_file_path, columns=None, filters=None):
+    """
+    Load the Parquet view, e.g. for the dashboard.
+    filters use pyarrow's DNF form and are pushed down to the row groups, for example
+    read_parquet(path, filters=[("date", ">=", "2023-01-01"), ("type", "=", "HTML")]).
+    Returns a pyarrow.Table; call .to_pandas() if a DataFrame is needed.
+    """
+    import pyarrow.parquet as pq
+
+    return pq.read_table(parquet_file_path, columns=columns, filters=filters)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert merged JSON records to CSV and Parquet.")
+    parser.add_argument(
+        "--input_json",
+        default=JSON_FILE,
+        help=f"Path to the input JSON file. Default is '{JSON_FILE}'."
+    )
+    parser.add_argument(
+        "--output_csv",
+        default=CSV_FILE,
+        help=f"Path to the output CSV file. Default is '{CSV_FILE}'."
+    )
+    parser.add_argument(
+        "--output_parquet",
+        default=PARQUET_FILE,
+        help=f"Path to the output Parquet file (requires pyarrow). Default is '{PARQUET_FILE}'."
+    )
+    parser.add_argument(
+        "--no_parquet",
+        action="store_true",
+        help="Only write the CSV file."
+    )
+    args = parser.parse_args(argv)
 
     # Read JSON data
-    with open(json_file_path, "r", encoding="utf-8") as file:
+    with open(args.input_json, "r", encoding="utf-8") as file:
         data = json.load(file)
 
     # Convert JSON to CSV
-    json_to_csv(data, csv_file_path)
+    json_to_csv(data, args.output_csv)
+    print(f"CSV file has been created at: {args.output_csv}")
+
+    if not args.no_parquet:
+        try:
+            json_to_parquet(data, args.output_parquet)
+            print(f"Parquet file has been created at: {args.output_parquet}")
+        except ImportError:
+            print("pyarrow is not installed; skipping Parquet output.")
 
-    print(f"CSV file has been created at: {csv_file_path}")
+if __name__ == "__main__":
+    main()
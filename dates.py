@@ -0,0 +1,78 @@
+import re
+import calendar
+from datetime import date
+from functools import lru_cache
+
+# Month names and abbreviations as accepted by strptime's %B / %b
+MONTHS = {}
+for i in range(1, 13):
+    MONTHS[calendar.month_name[i].lower()] = i
+    MONTHS[calendar.month_abbr[i].lower()] = i
+
+# Each pattern maps directly onto one of the formats previously tried with strptime,
+# so the right format is picked by a single regex match instead of trial and error.
+MONTH_DAY_YEAR = re.compile(r"([A-Za-z]+)\s+(\d{1,2}),\s+(\d{4})")  # January 16, 2025 / Jan 12, 2025
+MONTH_YEAR = re.compile(r"([A-Za-z]+)\s+(\d{4})")                  # January 2025 / Jan 2025
+DAY_MONTH_YEAR = re.compile(r"(\d{1,2})\s+([A-Za-z]+)\s+(\d{4})")  # 18 March 2022 / 18 Mar 2022
+ISO_DATE = re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})")              # 2025-01-16
+YEAR_MONTH = re.compile(r"(\d{4})-(\d{1,2})")                      # 2025-01
+YEAR = re.compile(r"(\d{4})")                                      # 2025
+# PDF date strings, e.g. D:20230105120000+01'00' as returned in /CreationDate
+PDF_DATE = re.compile(r"D:(\d{4})(\d{2})?(\d{2})?(?:\d{2}(?:\d{2}(?:\d{2})?)?)?(?:[Zz+\-].*)?")
+
+def _format(year, month=1, day=1):
+    """Return YYYY-MM-DD, or None if the components do not form a valid date."""
+    try:
+        return date(int(year), int(month), int(day)).strftime("%Y-%m-%d")
+    except ValueError:
+        return None
+
+def _month(name):
+    return MONTHS.get(name.lower())
+
+# Room for every distinct date string of a large bookmark collection; entries are a few dozen bytes
+@lru_cache(maxsize=65536)
+def _parse_date_str(date_str):
+    """Dispatch on the shape of the string and build the date directly."""
+    if date_str[:1].isdigit():
+        m = ISO_DATE.fullmatch(date_str)
+        if m:
+            return _format(*m.groups())
+        m = YEAR_MONTH.fullmatch(date_str)
+        if m:
+            return _format(*m.groups())
+        m = YEAR.fullmatch(date_str)
+        if m:
+            return _format(m.group(1))
+        m = DAY_MONTH_YEAR.fullmatch(date_str)
+        if m and _month(m.group(2)):
+            return _format(m.group(3), _month(m.group(2)), m.group(1))
+        return None
+
+    if date_str.startswith("D:"):
+        m = PDF_DATE.fullmatch(date_str)
+        if m:
+            year, month, day = m.groups()
+            return _format(year, month or 1, day or 1)
+        return None
+
+    m = MONTH_DAY_YEAR.fullmatch(date_str)
+    if m and _month(m.group(1)):
+        return _format(m.group(3), _month(m.group(1)), m.group(2))
+    m = MONTH_YEAR.fullmatch(date_str)
+    if m and _month(m.group(1)):
+        return _format(m.group(2), _month(m.group(1)))
+    return None
+
+def parse_date(date_str):
+    """
+    Normalize a date string to YYYY-MM-DD.
+    Accepts the formats "January 16, 2025", "Jan 12, 2025", "January 2025", "Jan 2025",
+    "18 March 2022", "18 Mar 2022", "2025-01-16", "2025-01", "2025" and PDF dates
+    such as "D:20250116093000Z". Results are cached, since the same strings recur often.
+    Returns the original value if it is not a string or matches no known format.
+    """
+    if not isinstance(date_str, str) or not date_str.strip():
+        return date_str
+    parsed = _parse_date_str(date_str)
+    return parsed if parsed is not None else date_str
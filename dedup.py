@@ -0,0 +1,283 @@
+import os
+import re
+import json
+import zlib
+import random
+import logging
+import argparse
+from collections import defaultdict
+
+GENERIC_JSON = "resources_extracted.json"
+ARXIV_JSON = "output_tags_clean.json"
+OUTPUT_JSON = "resources_deduplicated.json"
+DUPLICATES_JSON = "duplicates.json"
+
+SHINGLE_SIZE = 3      # words per shingle
+TEXT_WINDOW = 250     # only the first words are compared, where a paper's title and abstract live
+NUM_PERM = 128        # signature length
+BANDS = 32            # BANDS * ROWS must equal NUM_PERM; (1/BANDS)**(1/ROWS) ~ 0.42 similarity
+ROWS = 4
+THRESHOLD = 0.5       # minimum estimated Jaccard similarity or containment to call a pair duplicates
+MIN_SHINGLES = 30     # shorter texts (bot checks, "Access denied" and other error pages) are never clustered
+MIN_REPRESENTATIVE_WORDS = TEXT_WINDOW  # a non-arXiv representative must fill the comparison window
+
+MERSENNE_PRIME = (1 << 61) - 1
+
+def make_hash(seed=1):
+    """Coefficients (a, b) of the universal hash (a * x + b) mod p, fixed by seed so signatures are reproducible."""
+    rng = random.Random(seed)
+    return rng.randint(1, MERSENNE_PRIME - 1), rng.randint(0, MERSENNE_PRIME - 1)
+
+HASH_A, HASH_B = make_hash()
+
+def shingles(text, size=SHINGLE_SIZE, window=TEXT_WINDOW):
+    """Set of hashed word n-grams over the first window words of text."""
+    words = re.findall(r"\w+", text.lower())[:window]
+    if len(words) < size:
+        return {zlib.crc32(" ".join(words).encode())} if words else set()
+    return {zlib.crc32(" ".join(words[i:i + size]).encode()) for i in range(len(words) - size + 1)}
+
+def minhash(shingle_set, num_perm=NUM_PERM):
+    """
+    MinHash signature of a non-empty shingle set, computed with one-permutation hashing:
+    each shingle is hashed once and the hash space is split into num_perm bins, keeping
+    the minimum per bin. Empty bins borrow from the next non-empty bin (rotation
+    densification), which keeps the collision probability equal to the Jaccard similarity
+    at O(len(shingle_set)) cost instead of O(num_perm * len(shingle_set)).
+    """
+    bins = [None] * num_perm
+    for x in shingle_set:
+        h = (HASH_A * x + HASH_B) % MERSENNE_PRIME
+        i, value = h % num_perm, h // num_perm
+        if bins[i] is None or value < bins[i]:
+            bins[i] = value
+    signature = list(bins)
+    offset = MERSENNE_PRIME // num_perm + 1  # larger than any bin value
+    for i in range(num_perm):
+        if bins[i] is None:
+            j = 1
+            while bins[(i + j) % num_perm] is None:
+                j += 1
+            signature[i] = bins[(i + j) % num_perm] + j * offset
+    return signature
+
+def estimated_similarity(sig_a, sig_b, size_a, size_b):
+    """
+    Larger of the estimated Jaccard similarity and the estimated containment of
+    the smaller shingle set in the larger one. Containment matters when an arXiv
+    abstract is compared against the opening of the full paper text.
+    """
+    jaccard = sum(x == y for x, y in zip(sig_a, sig_b)) / len(sig_a)
+    smaller = min(size_a, size_b)
+    if not smaller:
+        return jaccard
+    containment = jaccard * (size_a + size_b) / ((1 + jaccard) * smaller)
+    return max(jaccard, min(containment, 1.0))
+
+def lsh_candidates(signatures, bands=BANDS, rows=ROWS):
+    """Pairs of keys whose signatures agree on all rows of at least one band."""
+    candidates = set()
+    for band in range(bands):
+        buckets = defaultdict(list)
+        for key, sig in signatures.items():
+            buckets[tuple(sig[band * rows:(band + 1) * rows])].append(key)
+        for keys in buckets.values():
+            for i in range(len(keys)):
+                for j in range(i + 1, len(keys)):
+                    candidates.add((keys[i], keys[j]))
+    return candidates
+
+def find_clusters(documents, threshold=THRESHOLD):
+    """
+    Group near-duplicate documents.
+    documents: {key: text}. Returns a list of clusters (lists of keys) with at least two members.
+    Documents with fewer than MIN_SHINGLES shingles are left out: short pages such as
+    bot checks and error pages are near-identical across unrelated urls.
+    """
+    sizes, signatures = {}, {}
+    for key, text in documents.items():
+        shingle_set = shingles(text)
+        if len(shingle_set) >= MIN_SHINGLES:
+            sizes[key] = len(shingle_set)
+            signatures[key] = minhash(shingle_set)
+
+    parent = {key: key for key in signatures}
+
+    def find(key):
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    candidates = lsh_candidates(signatures)
+    logging.info(f"{len(candidates)} candidate pairs among {len(signatures)} documents")
+    for a, b in candidates:
+        if estimated_similarity(signatures[a], signatures[b], sizes[a], sizes[b]) >= threshold:
+            parent[find(a)] = find(b)
+
+    groups = defaultdict(list)
+    for key in signatures:
+        groups[find(key)].append(key)
+    return [sorted(members) for members in groups.values() if len(members) > 1]
+
+def word_count(text):
+    return len(re.findall(r"\w+", text or ""))
+
+def choose_representative(members, generic, arxiv):
+    """
+    Prefer an arXiv record, which already has clean metadata; otherwise the longest
+    extracted text. Returns None when that text is shorter than MIN_REPRESENTATIVE_WORDS,
+    since a cluster of short pages is more likely shared boilerplate than one document.
+    """
+    for key in members:
+        if key in arxiv:
+            return key
+    representative = max(members, key=lambda key: len(generic[key].get("extracted_text") or ""))
+    if word_count(generic[representative].get("extracted_text")) < MIN_REPRESENTATIVE_WORDS:
+        return None
+    return representative
+
+def deduplicate(generic_records, arxiv_records, threshold=THRESHOLD):
+    """
+    Cluster near-duplicate resources.
+    Returns (records to annotate with gpt, clusters). Each cluster is a dict with a
+    'representative' url and its duplicate 'members' urls. Generic records that
+    duplicate an arXiv record or another generic record are left out of the
+    records to annotate; propagate_metadata fills them in afterwards.
+    """
+    generic = {r["url"]: r for r in generic_records if r.get("url")}
+    arxiv = {r["locator"]: r for r in arxiv_records if r.get("locator")}
+    documents = {url: r.get("extracted_text") or "" for url, r in generic.items()}
+    documents.update({locator: r.get("abstract") or "" for locator, r in arxiv.items()})
+
+    clusters = []
+    skipped = set()
+    for members in find_clusters(documents, threshold):
+        # Clusters made only of arXiv records need no action
+        if all(key in arxiv for key in members):
+            continue
+        representative = choose_representative(members, generic, arxiv)
+        if representative is None:
+            continue
+        duplicates = [key for key in members if key != representative and key in generic]
+        skipped.update(duplicates)
+        clusters.append({"representative": representative, "members": duplicates})
+
+    to_annotate = [r for r in generic_records if r.get("url") not in skipped]
+    return to_annotate, clusters
+
+def arxiv_metadata(record):
+    """arXiv record in the shape returned by gpt_process.py."""
+    date = record.get("date", "")
+    return {
+        "title": record.get("resource_name", ""),
+        "author": record.get("authors", []),
+        "date": date[:10] if isinstance(date, str) else date,
+        "abstract": record.get("abstract", ""),
+        "tags": record.get("tags", []),
+    }
+
+def extracted_metadata(record):
+    """Metadata process_generic.py extracted from a resource, in the shape returned by gpt_process.py."""
+    return {
+        "title": record.get("extracted_title") or "",
+        "author": record.get("extracted_author") or [],
+        "date": record.get("extracted_date") or "",
+        "abstract": "",
+        "tags": [],
+    }
+
+def propagate_metadata(processed_records, clusters, arxiv_records, generic_records):
+    """
+    Build records for the duplicates that were not sent to gpt by copying the
+    representative's metadata, keeping each duplicate's own url, type and uuid.
+    If gpt failed on the representative, the duplicates get their own extracted
+    metadata instead, unannotated; the representative is sent again on the next
+    run, and its duplicates are filled in from it once it succeeds.
+    Returns the list of new records.
+    """
+    processed = {r["url"]: r for r in processed_records if r.get("url")}
+    arxiv = {r["locator"]: r for r in arxiv_records if r.get("locator")}
+    generic = {r["url"]: r for r in generic_records if r.get("url")}
+
+    propagated = []
+    for cluster in clusters:
+        representative = cluster["representative"]
+        if representative in processed:
+            metadata = {k: v for k, v in processed[representative].items() if k not in ("url", "type", "uuid")}
+        elif representative in arxiv:
+            metadata = arxiv_metadata(arxiv[representative])
+        else:
+            logging.warning(
+                f"No processed record for representative {representative}; "
+                f"writing its {len(cluster['members'])} duplicates unannotated"
+            )
+            metadata = None
+        for url in cluster["members"]:
+            if url in processed:
+                continue
+            source = generic.get(url, {})
+            record = dict(metadata) if metadata is not None else extracted_metadata(source)
+            record["url"] = url
+            record["type"] = source.get("type", "")
+            record["uuid"] = source.get("uuid", "")
+            record["duplicate_of"] = representative
+            propagated.append(record)
+    return propagated
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Detect near-duplicate resources before gpt annotation.")
+    parser.add_argument(
+        "--input_json",
+        default=GENERIC_JSON,
+        help=f"Path to the extracted non-arXiv resources. Default is '{GENERIC_JSON}'."
+    )
+    parser.add_argument(
+        "--arxiv_json",
+        default=ARXIV_JSON,
+        help=f"Path to the arXiv records. Default is '{ARXIV_JSON}'."
+    )
+    parser.add_argument(
+        "--output_json",
+        default=OUTPUT_JSON,
+        help=f"Path for the resources that still need gpt annotation. Default is '{OUTPUT_JSON}'."
+    )
+    parser.add_argument(
+        "--duplicates_json",
+        default=DUPLICATES_JSON,
+        help=f"Path for the duplicate clusters. Default is '{DUPLICATES_JSON}'."
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=THRESHOLD,
+        help=f"Minimum estimated similarity for duplicates. Default is {THRESHOLD}."
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(message)s"
+    )
+
+    with open(args.input_json, "r", encoding="utf-8") as f:
+        generic_records = json.load(f)
+    arxiv_records = []
+    if os.path.exists(args.arxiv_json):
+        with open(args.arxiv_json, "r", encoding="utf-8") as f:
+            arxiv_records = json.load(f)
+
+    to_annotate, clusters = deduplicate(generic_records, arxiv_records, args.threshold)
+
+    with open(args.output_json, "w", encoding="utf-8") as f:
+        json.dump(to_annotate, f, indent=2, ensure_ascii=False)
+    with open(args.duplicates_json, "w", encoding="utf-8") as f:
+        json.dump(clusters, f, indent=2)
+
+    logging.info(
+        f"{len(clusters)} duplicate clusters; {len(to_annotate)} of {len(generic_records)} resources left to annotate. "
+        f"Saved to {args.output_json} and {args.duplicates_json}"
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,402 @@
+import os
+import time
+import json
+import heapq
+import logging
+import argparse
+from collections import deque
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+import metrics
+
+HEALTH_FILE = "host_health.json"
+
+# User-Agent header of every request, robots.txt included, so hosts see one client
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/117.0.5938.132 Safari/537.36"
+)
+ROBOTS_AGENT = "urldash"     # product token matched against robots.txt rules
+ROBOTS_TTL = 24 * 3600       # seconds a cached robots.txt stays valid
+
+ALPHA = 0.3                  # weight of the newest observation in the latency and error-rate EWMAs
+DEFAULT_LATENCY = 2.0        # assumed seconds per request for hosts never seen before
+DEFAULT_TIMEOUT = 10         # seconds, for hosts never seen before
+MIN_TIMEOUT = 5
+MAX_TIMEOUT = 30
+TIMEOUT_FACTOR = 4           # timeout is this many times the host's latency EWMA
+
+# Circuit breaker: after FAILURE_THRESHOLD consecutive host-level failures (timeouts,
+# connection errors, 5xx) the host is skipped for BASE_COOLDOWN seconds, doubling with
+# every further failure up to MAX_COOLDOWN. After the cooldown one probe request is let
+# through (half-open); it closes the circuit on success and reopens it on failure.
+FAILURE_THRESHOLD = 3
+BASE_COOLDOWN = 3600
+MAX_COOLDOWN = 7 * 24 * 3600
+
+THROTTLE_DELAY = 30          # seconds to back off after a 429/503 without Retry-After
+MAX_WAIT = 60                # longest in-run wait for a delayed host; longer delays skip it until the next run
+MAX_ATTEMPTS = 2             # fetches of one url per run, counting retries after throttling
+
+# Failed urls are not retried for URL_BACKOFF seconds, doubling per failure up to
+# MAX_COOLDOWN. Urls that are gone (404, 410) or forbidden start at GONE_BACKOFF.
+URL_BACKOFF = 24 * 3600
+GONE_BACKOFF = 7 * 24 * 3600
+GONE_STATUSES = {401, 403, 404, 410}
+THROTTLE_STATUSES = {429, 503}
+
+def host_of(url):
+    return urlparse(url).netloc.lower()
+
+def classify(error):
+    """
+    (kind, status, retry_after) for an exception raised while fetching a url.
+    kind is 'host' when the host itself is unhealthy (timeouts, connection errors, 5xx),
+    'throttle' for 429/503 and 'url' when only this url failed (other 4xx, bad content).
+    """
+    import requests
+
+    response = getattr(error, "response", None)
+    status = response.status_code if response is not None else None
+    if status in THROTTLE_STATUSES:
+        retry_after = response.headers.get("Retry-After", "")
+        return "throttle", status, float(retry_after) if retry_after.isdigit() else THROTTLE_DELAY
+    if status is not None:
+        return ("host" if status >= 500 else "url"), status, None
+    if isinstance(error, (requests.Timeout, requests.ConnectionError)):
+        return "host", None, None
+    return "url", None, None
+
+class FetchScheduler:
+    """
+    Per-host health statistics, kept across runs in a JSON file, and the download
+    order they imply.
+
+    self.hosts maps each host to its latency and error-rate EWMAs, request and failure
+    counts, consecutive failures, last failure and circuit state. self.urls remembers
+    urls that failed, so they are retried with exponential backoff instead of on every
+    run. self.robots caches robots.txt per host.
+
+    schedule() yields the urls worth fetching now, cheapest host first, honoring
+    circuit breakers, robots.txt, crawl delays and the per-host budget; the caller
+    fetches each url and reports the outcome through record_success()/record_failure()
+    before asking for the next one.
+    """
+
+    def __init__(self, hosts=None, urls=None, robots=None, respect_robots=True, budget=None):
+        self.hosts = dict(hosts or {})
+        self.urls = dict(urls or {})
+        self.robots = dict(robots or {})
+        self.respect_robots = respect_robots
+        self.budget = budget  # maximum fetches per host per run, None for no limit
+        self.skipped = []     # (url, reason) for urls schedule() decided not to fetch
+        self.clock = time.time
+        self.sleep = time.sleep
+        self._parsers = {}
+        self._unreachable = set()  # hosts whose robots.txt could not be fetched, with nothing cached
+        self._retry = None
+
+    def host(self, host):
+        stats = self.hosts.get(host)
+        if stats is None:
+            stats = self.hosts[host] = {
+                "latency": None, "error_rate": 0.0, "requests": 0, "failures": 0,
+                "consecutive_failures": 0, "last_success": None, "last_failure": None,
+                "last_error": None, "open_until": None,
+            }
+        return stats
+
+    def timeout(self, host):
+        """Request timeout for host, scaled to its observed latency."""
+        latency = self.hosts.get(host, {}).get("latency")
+        if latency is None:
+            return DEFAULT_TIMEOUT
+        return min(MAX_TIMEOUT, max(MIN_TIMEOUT, TIMEOUT_FACTOR * latency))
+
+    def expected_cost(self, host):
+        """Expected seconds per successful fetch from host: latency EWMA over success rate."""
+        stats = self.hosts.get(host, {})
+        latency = stats.get("latency")
+        if latency is None:
+            latency = DEFAULT_LATENCY
+        return latency / max(1.0 - stats.get("error_rate", 0.0), 0.05)
+
+    def state(self, host, now=None):
+        """'closed' (healthy), 'open' (skip until open_until) or 'half-open' (one probe allowed)."""
+        stats = self.hosts.get(host)
+        if not stats or not stats["open_until"]:
+            return "closed"
+        now = self.clock() if now is None else now
+        return "open" if now < stats["open_until"] else "half-open"
+
+    def retry_at(self, url):
+        """Time before which a previously failed url is not fetched again, or None."""
+        entry = self.urls.get(url)
+        if not entry:
+            return None
+        base = GONE_BACKOFF if entry.get("status") in GONE_STATUSES else URL_BACKOFF
+        return entry["last_failure"] + min(MAX_COOLDOWN, base * 2 ** (entry["failures"] - 1))
+
+    def _observe(self, stats, seconds, failed):
+        stats["requests"] += 1
+        if seconds is not None:
+            stats["latency"] = seconds if stats["latency"] is None else ALPHA * seconds + (1 - ALPHA) * stats["latency"]
+        stats["error_rate"] = ALPHA * failed + (1 - ALPHA) * stats["error_rate"]
+
+    def record_success(self, url, seconds):
+        host = host_of(url)
+        stats = self.host(host)
+        self._observe(stats, seconds, 0)
+        stats["consecutive_failures"] = 0
+        stats["last_success"] = self.clock()
+        stats["open_until"] = None
+        self.urls.pop(url, None)
+
+    def _fail_url(self, url, status, error):
+        entry = self.urls.setdefault(url, {"failures": 0})
+        entry["failures"] += 1
+        entry["last_failure"] = self.clock()
+        entry["status"] = status
+        entry["error"] = str(error)[:200]
+        return entry
+
+    def record_unusable(self, url, reason):
+        """Back off from a url that downloaded fine but cannot be used, e.g. an unsupported content type."""
+        self._fail_url(url, None, reason)
+
+    def record_failure(self, url, seconds, error):
+        """Record a failed fetch of url that raised error, and update the host's circuit."""
+        kind, status, retry_after = classify(error)
+        host = host_of(url)
+        stats = self.host(host)
+        now = self.clock()
+
+        if kind == "throttle":
+            # The host answered, so its latency counts, but it asked us to slow down
+            self._observe(stats, seconds, 0)
+            stats["open_until"] = now + retry_after
+            self._retry = url
+            metrics.count("fetch_throttled_total", host=host)
+            logging.info(f"{host} throttled us ({status}); backing off {retry_after:.0f}s")
+            return
+
+        entry = self._fail_url(url, status, error)
+
+        if kind == "url":
+            # The host is fine; only this url is broken
+            self._observe(stats, seconds, 0)
+            stats["consecutive_failures"] = 0
+            stats["open_until"] = None
+            return
+
+        # Not a response time: a timeout only bounds the latency from below, and a
+        # refused connection says nothing about it
+        self._observe(stats, None, 1)
+        stats["failures"] += 1
+        stats["consecutive_failures"] += 1
+        stats["last_failure"] = now
+        stats["last_error"] = entry["error"]
+        excess = stats["consecutive_failures"] - FAILURE_THRESHOLD
+        if excess >= 0:
+            stats["open_until"] = now + min(MAX_COOLDOWN, BASE_COOLDOWN * 2 ** excess)
+            metrics.count("circuit_opened_total", host=host)
+            logging.warning(
+                f"Circuit open for {host} after {stats['consecutive_failures']} consecutive failures; "
+                f"skipping it for {stats['open_until'] - now:.0f}s"
+            )
+
+    def robots_parser(self, scheme, host):
+        """
+        RobotFileParser for host, from the cache or fetched. When robots.txt cannot
+        be fetched (5xx or network error), an expired cached copy is used; without
+        one the host is fully disallowed for this run, as RFC 9309 requires.
+        """
+        if host in self._parsers:
+            return self._parsers[host]
+        now = self.clock()
+        cached = self.robots.get(host)
+        parser = RobotFileParser()
+        if not cached or now - cached["fetched"] > ROBOTS_TTL:
+            fetched = self.fetch_robots(scheme, host)
+            if fetched is not None:
+                cached = self.robots[host] = fetched
+            elif cached:
+                logging.info(f"robots.txt of {host} unreachable; using the copy cached {now - cached['fetched']:.0f}s ago")
+            else:
+                logging.info(f"robots.txt of {host} unreachable; skipping the host this run")
+                parser.disallow_all = True
+                self._unreachable.add(host)
+                self._parsers[host] = parser
+                return parser
+        # RFC 9309: any 4xx, 401 and 403 included, means there are no rules
+        if cached["status"] >= 400:
+            parser.allow_all = True
+        else:
+            parser.parse(cached["lines"])
+        self._parsers[host] = parser
+        return parser
+
+    def fetch_robots(self, scheme, host):
+        """Fetch robots.txt; returns the cache entry, or None if it could not be fetched."""
+        import requests
+
+        url = f"{scheme}://{host}/robots.txt"
+        start = time.perf_counter()
+        try:
+            response = requests.get(url, headers={"User-Agent": USER_AGENT}, timeout=self.timeout(host))
+        except Exception as e:
+            # Counts against the host like any other failed request; not cached, so it is retried next run
+            logging.info(f"Could not fetch {url}: {e}")
+            self.record_failure(url, time.perf_counter() - start, e)
+            self.urls.pop(url, None)
+            return None
+        if response.status_code >= 500:
+            return None
+        metrics.count("robots_fetched_total")
+        return {"fetched": self.clock(), "status": response.status_code, "lines": response.text.splitlines()}
+
+    def crawl_delay(self, parser):
+        if parser is None:
+            return 0
+        delay = parser.crawl_delay(ROBOTS_AGENT)
+        if delay is None:
+            rate = parser.request_rate(ROBOTS_AGENT)
+            delay = rate.seconds / rate.requests if rate and rate.requests else 0
+        return float(delay)
+
+    def skip(self, url, reason):
+        self.skipped.append((url, reason))
+        metrics.count("fetch_skipped_total", reason=reason)
+        logging.info(f"Skipping {url}: {reason}")
+
+    def schedule(self, urls):
+        """
+        Yield the urls to fetch, one at a time. Hosts are served cheapest first (lowest
+        expected_cost); a host whose crawl delay or throttling back-off has not elapsed
+        waits while other hosts go ahead. Urls on open circuits, disallowed by robots.txt,
+        over the host budget, behind a crawl delay longer than MAX_WAIT or still backing
+        off from earlier failures are recorded in self.skipped instead.
+        """
+        now = self.clock()
+        queues = {}
+        for url in dict.fromkeys(urls):
+            retry_at = self.retry_at(url)
+            if retry_at and retry_at > now:
+                self.skip(url, "backing off after earlier failures")
+                continue
+            queues.setdefault(host_of(url), deque()).append(url)
+
+        ready = [(self.expected_cost(host), host) for host in queues]
+        heapq.heapify(ready)
+        waiting = []  # (ready_at, host)
+        fetched = dict.fromkeys(queues, 0)
+        attempts = {}
+
+        while ready or waiting:
+            now = self.clock()
+            while waiting and waiting[0][0] <= now:
+                _, host = heapq.heappop(waiting)
+                heapq.heappush(ready, (self.expected_cost(host), host))
+            if not ready:
+                self.sleep(waiting[0][0] - now)
+                continue
+
+            _, host = heapq.heappop(ready)
+            queue = queues[host]
+            if self.state(host, now) == "open":
+                open_until = self.hosts[host]["open_until"]
+                if open_until - now <= MAX_WAIT:
+                    heapq.heappush(waiting, (open_until, host))
+                else:
+                    for url in queue:
+                        self.skip(url, "circuit open")
+                continue
+            if self.budget is not None and fetched[host] >= self.budget:
+                for url in queue:
+                    self.skip(url, "host budget exhausted")
+                continue
+
+            url = queue.popleft()
+            parser = None
+            if self.respect_robots:
+                parser = self.robots_parser(urlparse(url).scheme or "https", host)
+                if self.state(host) == "open":
+                    # robots.txt fetch failures count towards the circuit breaker
+                    queue.appendleft(url)
+                    heapq.heappush(ready, (self.expected_cost(host), host))
+                    continue
+                if parser is not None and not parser.can_fetch(ROBOTS_AGENT, url):
+                    self.skip(url, "robots.txt unreachable" if host in self._unreachable else "disallowed by robots.txt")
+                    if queue:
+                        heapq.heappush(ready, (self.expected_cost(host), host))
+                    continue
+
+            fetched[host] += 1
+            attempts[url] = attempts.get(url, 0) + 1
+            self._retry = None
+            yield url
+
+            if self._retry == url:
+                if attempts[url] < MAX_ATTEMPTS:
+                    queue.appendleft(url)
+                else:
+                    self.skip(url, "still throttled")
+            if queue:
+                # A failed half-open probe reopens the circuit, which the next pop acts on
+                delay = self.crawl_delay(parser)
+                if delay > MAX_WAIT:
+                    # One url per run is all such a host gets
+                    for url in queue:
+                        self.skip(url, "crawl delay too long")
+                elif delay:
+                    heapq.heappush(waiting, (self.clock() + delay, host))
+                else:
+                    heapq.heappush(ready, (self.expected_cost(host), host))
+
+    def save(self, path=HEALTH_FILE):
+        data = {"hosts": self.hosts, "urls": self.urls, "robots": self.robots}
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=HEALTH_FILE, respect_robots=True, budget=None):
+        """Load saved host health, or start empty if path does not exist."""
+        if not os.path.exists(path):
+            return cls(respect_robots=respect_robots, budget=budget)
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["hosts"], data["urls"], data["robots"], respect_robots, budget)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show or reset the per-host fetch health kept by generic.py.")
+    parser.add_argument("--health_json", default=HEALTH_FILE, help=f"Path to the host health file. Default is '{HEALTH_FILE}'.")
+    parser.add_argument("--reset", nargs="+", metavar="HOST", help="Forget the statistics and failed urls of these hosts.")
+    args = parser.parse_args(argv)
+
+    scheduler = FetchScheduler.load(args.health_json)
+    if args.reset:
+        for host in args.reset:
+            scheduler.hosts.pop(host, None)
+            scheduler.robots.pop(host, None)
+        scheduler.urls = {url: entry for url, entry in scheduler.urls.items() if host_of(url) not in args.reset}
+        scheduler.save(args.health_json)
+        print(f"Reset {len(args.reset)} hosts in {args.health_json}")
+        return
+
+    failed_urls = {}
+    for url in scheduler.urls:
+        failed_urls[host_of(url)] = failed_urls.get(host_of(url), 0) + 1
+    print(f"{'host':40s} {'state':9s} {'latency':>8s} {'errors':>7s} {'requests':>8s} {'failed urls':>11s}")
+    for host in sorted(scheduler.hosts, key=scheduler.expected_cost):
+        stats = scheduler.hosts[host]
+        latency = f"{stats['latency']:.2f}s" if stats["latency"] is not None else "-"
+        print(
+            f"{host[:40]:40s} {scheduler.state(host):9s} {latency:>8s} {stats['error_rate']:7.0%} "
+            f"{stats['requests']:8d} {failed_urls.get(host, 0):11d}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -2,18 +2,19 @@ import os
 import csv
 import uuid
 import json
+import time
 import logging
-import requests
-import pandas as pd
-from bs4 import BeautifulSoup
-from PyPDF2 import PdfReader
 import argparse
+from urllib.parse import urlparse
+import metrics
+import pdf_access
+from fetch_scheduler import FetchScheduler, HEALTH_FILE, DEFAULT_TIMEOUT, USER_AGENT
+
+# requests, pandas and BeautifulSoup are imported in the functions that use them,
+# so that importing this module stays cheap
 
 PDF_DIR = "downloaded_pdfs"
 HTML_DIR = "downloaded_html"
-os.makedirs(PDF_DIR, exist_ok=True)
-os.makedirs(HTML_DIR, exist_ok=True)
-
 
 LOGFILE = "generic_metadata.log"
 BOOKMARKS_CSV = "bookmarks.csv"
@@ -21,6 +22,8 @@ DOWNLOAD_LOG_CSV = "download_log.csv"
 OUTPUT_JSON = "non_arxiv_output.json"
 
 def read_urls_from_csv(file_path: str) -> list:
+    import pandas as pd
+
     try:
         df = pd.read_csv(file_path)
         if 'url' not in df.columns:
@@ -69,173 +72,210 @@ def write_download_log_csv(log_file: str, download_log: dict):
     except Exception as e:
         logging.error(f"Failed to write download log {log_file}: {e}")
 
-def download_resource(url: str) -> tuple[bytes, str]:
+def download_resource(url: str, scheduler: FetchScheduler = None) -> tuple[bytes, str]:
     """
     Returns (content, content_type) or (None, None) on error.
+    With a scheduler, the timeout adapts to the host's latency and the outcome
+    is recorded in the host's health statistics.
     """
-    headers = {
-        "User-Agent": (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/117.0.5938.132 Safari/537.36"
-        )
-    }
+    import requests
+
+    headers = {"User-Agent": USER_AGENT}
+    host = urlparse(url).netloc
+    timeout = scheduler.timeout(host.lower()) if scheduler else DEFAULT_TIMEOUT
+    start = time.perf_counter()
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        with metrics.timer("download_seconds", host=host):
+            response = requests.get(url, headers=headers, timeout=timeout)
         response.raise_for_status()
         content_type = response.headers.get("Content-Type", "").lower()
+        metrics.count("download_bytes_total", len(response.content), host=host)
+        if scheduler:
+            scheduler.record_success(url, time.perf_counter() - start)
         return response.content, content_type
     except Exception as e:
+        metrics.count("download_errors_total", host=host)
         logging.error(f"Failed to download {url}: {e}")
+        if scheduler:
+            scheduler.record_failure(url, time.perf_counter() - start, e)
         return None, None
     
 def extract_html_title(content: bytes) -> str:
     """
     Extract the <title> tag from HTML. Returns 'Untitled' if not found.
     """
+    from bs4 import BeautifulSoup
+
     try:
-        soup = BeautifulSoup(content, "html.parser")
+        with metrics.timer("title_extraction_seconds", type="html"):
+            soup = BeautifulSoup(content, "html.parser")
         title_tag = soup.find("title")
         return title_tag.get_text(strip=True) if title_tag else "Untitled"
     except Exception as e:
         logging.error(f"Failed to extract HTML title: {e}")
         return "Untitled"
 
-def extract_pdf_title(content: bytes) -> str:
+def extract_pdf_title(source) -> str:
+    """
+    Title from the Info dictionary of a PDF, given its path or its bytes.
+    Returns 'Unknown Title' if not found.
+    """
     try:
-        with open("temp.pdf", "wb") as f:
-            f.write(content)
-        reader = PdfReader("temp.pdf")
-        title = reader.metadata.get('/Title', None)
-        os.remove("temp.pdf")
-        return str(title) if title else "Unknown Title"
+        with metrics.timer("title_extraction_seconds", type="pdf"):
+            title = pdf_access.metadata(source)["title"]
+        return title or "Unknown Title"
     except Exception as e:
         logging.error(f"Failed to extract PDF title: {e}")
         return "Unknown Title"
 
+def save_download(url: str, scheduler: FetchScheduler, download_log: dict, results: list):
+    """
+    Download url, save it under PDF_DIR or HTML_DIR, and add it to download_log and results.
+    """
+    logging.info(f"Downloading {url}")
+    content, content_type = download_resource(url, scheduler)
+
+    if not content:
+        logging.error(f"No content downloaded for {url}")
+        return
+
+    if "application/pdf" in content_type:
+        # PDF
+        file_uuid = f"{uuid.uuid4()}.pdf"
+        pdf_path = os.path.join(PDF_DIR, file_uuid)
+        try:
+            with open(pdf_path, "wb") as f:
+                f.write(content)
+
+            download_log[url] = {"type": "PDF", "uuid": file_uuid}
+
+            # Extract and summarize
+            title = extract_pdf_title(content)
+            results.append({
+                "url": url,
+                "type": "PDF",
+                "title": title,
+                "local_file": pdf_path,
+            })
+        except Exception as e:
+            logging.error(f"Failed to save/process PDF for {url}: {e}")
+
+    elif "text/html" in content_type:
+        # HTML
+        file_uuid = f"{uuid.uuid4()}.html"
+        html_path = os.path.join(HTML_DIR, file_uuid)
+        try:
+            with open(html_path, "wb") as f:
+                f.write(content)
+
+            download_log[url] = {"type": "HTML", "uuid": file_uuid}
+
+            title = extract_html_title(content)
+
+            results.append({
+                "url": url,
+                "type": "HTML",
+                "title": title,
+                "local_file": html_path,
+            })
+        except Exception as e:
+            logging.error(f"Failed to save/process HTML for {url}: {e}")
+
+    else:
+        logging.warning(f"Unsupported content type for {url}: {content_type}")
+        if scheduler:
+            scheduler.record_unusable(url, f"unsupported content type {content_type}")
+
 def process_urls(
     input_csv: str,
     log_csv: str,
-    output_json: str
+    output_json: str,
+    health_json: str = HEALTH_FILE,
+    respect_robots: bool = True,
+    host_budget: int = None
 ):
     """
     - Reads URLs from input_csv.
     - Skips those containing 'arxiv.org'.
     - If URL is already in log_csv, use the local file for reprocessing (text extraction + summary).
-    - Otherwise, download the URL, updated log_csv, and process text.
+    - Otherwise, download the URL, updated log_csv, and process text. Downloads are ordered
+      and filtered by the FetchScheduler, whose per-host health is kept in health_json.
     - Writes final processed data to output_json.
     """
 
+    os.makedirs(PDF_DIR, exist_ok=True)
+    os.makedirs(HTML_DIR, exist_ok=True)
+
     # Load data
     urls = read_urls_from_csv(input_csv)
     download_log = read_download_log_csv(log_csv)
+    scheduler = FetchScheduler.load(health_json, respect_robots, host_budget)
     results = []
+    pending = []
 
     for url in urls:
-        # Skip arxiv
-        if "arxiv.org" in url:
-            logging.info(f"Skipping arxiv.org URL: {url}")
+        if "arxiv.org" not in url and url not in download_log:
+            # Downloaded below, in the order the scheduler picks
+            pending.append(url)
             continue
 
-        # Check log to see if we already have a record
-        if url in download_log:
-            logging.info(f"Already have a local file for {url}, reprocessing text.")
-            filetype = download_log[url]["type"]
-            file_uuid = download_log[url]["uuid"]
-
-            if filetype.lower() == "pdf":
-                pdf_path = os.path.join(PDF_DIR, file_uuid)
-                if not os.path.exists(pdf_path):
-                    logging.error(f"Logged PDF path not found: {pdf_path}")
-                    continue
-                with open(pdf_path, "rb") as f:
-                    content = f.read()
-
-                title = extract_pdf_title(content)
-
-                results.append({
-                    "url": url,
-                    "type": "PDF",
-                    "uuid": file_uuid,
-                    "title": title,
-                    "local_file": pdf_path,
-                })
-
-            elif filetype.lower() == "html":
-                html_path = os.path.join(HTML_DIR, file_uuid)
-                if not os.path.exists(html_path):
-                    logging.error(f"Logged HTML path not found: {html_path}")
-                    continue
-                with open(html_path, "rb") as f:
-                    content = f.read()
-
-                # Extract and summarize
-                title = extract_html_title(content)
-                results.append({
-                    "url": url,
-                    "type": "HTML",
-                    "uuid": file_uuid,
-                    "title": title,
-                    "local_file": html_path,
-                })
-
-            else:
-                logging.error(f"Unknown filetype for {url} in download_log.")
-            continue
-
-        # Otherwise, we need to download
-        logging.info(f"Downloading {url}")
-        content, content_type = download_resource(url)
-
-        if not content:
-            logging.error(f"No content downloaded for {url}")
-            continue
+        with metrics.record("generic", url):
+            # Skip arxiv
+            if "arxiv.org" in url:
+                logging.info(f"Skipping arxiv.org URL: {url}")
+                continue
+
+            # Check log to see if we already have a record
+            if url in download_log:
+                logging.info(f"Already have a local file for {url}, reprocessing text.")
+                filetype = download_log[url]["type"]
+                file_uuid = download_log[url]["uuid"]
+
+                if filetype.lower() == "pdf":
+                    pdf_path = os.path.join(PDF_DIR, file_uuid)
+                    if not os.path.exists(pdf_path):
+                        logging.error(f"Logged PDF path not found: {pdf_path}")
+                        continue
+
+                    title = extract_pdf_title(pdf_path)
+
+                    results.append({
+                        "url": url,
+                        "type": "PDF",
+                        "uuid": file_uuid,
+                        "title": title,
+                        "local_file": pdf_path,
+                    })
+
+                elif filetype.lower() == "html":
+                    html_path = os.path.join(HTML_DIR, file_uuid)
+                    if not os.path.exists(html_path):
+                        logging.error(f"Logged HTML path not found: {html_path}")
+                        continue
+                    with open(html_path, "rb") as f:
+                        content = f.read()
+
+                    # Extract and summarize
+                    title = extract_html_title(content)
+                    results.append({
+                        "url": url,
+                        "type": "HTML",
+                        "uuid": file_uuid,
+                        "title": title,
+                        "local_file": html_path,
+                    })
+
+                else:
+                    logging.error(f"Unknown filetype for {url} in download_log.")
 
-        if "application/pdf" in content_type:
-            # PDF
-            file_uuid = f"{uuid.uuid4()}.pdf"
-            pdf_path = os.path.join(PDF_DIR, file_uuid)
-            try:
-                with open(pdf_path, "wb") as f:
-                    f.write(content)
-
-                download_log[url] = {"type": "PDF", "uuid": file_uuid}
-
-                # Extract and summarize
-                title = extract_pdf_title(content)
-                results.append({
-                    "url": url,
-                    "type": "PDF",
-                    "title": title,
-                    "local_file": pdf_path,
-                })
-            except Exception as e:
-                logging.error(f"Failed to save/process PDF for {url}: {e}")
-
-        elif "text/html" in content_type:
-            # HTML
-            file_uuid = f"{uuid.uuid4()}.html"
-            html_path = os.path.join(HTML_DIR, file_uuid)
-            try:
-                with open(html_path, "wb") as f:
-                    f.write(content)
-
-                download_log[url] = {"type": "HTML", "uuid": file_uuid}
-
-                title = extract_html_title(content)
-
-                results.append({
-                    "url": url,
-                    "type": "HTML",
-                    "title": title,
-                    "local_file": html_path,
-                })
-            except Exception as e:
-                logging.error(f"Failed to save/process HTML for {url}: {e}")
-
-        else:
-            logging.warning(f"Unsupported content type for {url}: {content_type}")
-            continue
+    try:
+        for url in scheduler.schedule(pending):
+            with metrics.record("generic", url):
+                save_download(url, scheduler, download_log, results)
+    finally:
+        scheduler.save(health_json)
+    if scheduler.skipped:
+        logging.info(f"Skipped {len(scheduler.skipped)} of {len(pending)} downloads; see {health_json}")
 
     try:
         with open(output_json, "w", encoding="utf-8") as f:
@@ -246,7 +286,7 @@ def process_urls(
 
     write_download_log_csv(log_csv, download_log)
 
-if __name__ == "__main__":
+def main(argv=None):
     parser = argparse.ArgumentParser(
         description="Download urls",
     )
@@ -265,18 +305,40 @@ if __name__ == "__main__":
         default=DOWNLOAD_LOG_CSV,
         help=f"Path to log of previously downloaded files. Default is {DOWNLOAD_LOG_CSV}"
     )
+    parser.add_argument(
+        "--health_json",
+        default=HEALTH_FILE,
+        help=f"Path to the per-host health statistics kept across runs. Default is '{HEALTH_FILE}'."
+    )
+    parser.add_argument(
+        "--host_budget",
+        type=int,
+        help="Maximum downloads per host in this run; the rest wait for the next run. Default is no limit."
+    )
+    parser.add_argument(
+        "--ignore_robots",
+        action="store_true",
+        help="Do not fetch or honor robots.txt."
+    )
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     logging.basicConfig(
-        filename=args.log_csv,
+        filename=LOGFILE,
         level=logging.INFO,
         format="%(asctime)s - %(levelname)s - %(message)s"
     )
 
     # Example usage
-    process_urls(
-        input_csv=args.input_csv,
-        log_csv=args.log_csv,
-        output_json=args.output_json
-    )
+    with metrics.stage("generic"):
+        process_urls(
+            input_csv=args.input_csv,
+            log_csv=args.log_csv,
+            output_json=args.output_json,
+            health_json=args.health_json,
+            respect_robots=not args.ignore_robots,
+            host_budget=args.host_budget
+        )
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,50 @@
 import json
 import os
 import time
-from openai import OpenAI
 import logging
-from dotenv import load_dotenv
+import weakref
 import argparse
+import metrics
 
-load_dotenv()
-# Set up OpenAI API key
-client = OpenAI(
-  api_key=os.getenv("OPENAI_API_KEY")
-)
+_client = None
+_requests = 0  # HTTP requests sent by the client, including the SDK's own retries
+_sent_at = weakref.WeakKeyDictionary()  # request -> time it was sent
+
+def _on_request(request):
+    global _requests
+    _requests += 1
+    _sent_at[request] = time.perf_counter()
+
+def _on_response(response):
+    # Latency of one HTTP request, up to its response headers; the SDK's backoff sleeps fall between requests
+    sent_at = _sent_at.pop(response.request, None)
+    if sent_at is not None:
+        metrics.observe("gpt_request_seconds", time.perf_counter() - sent_at)
+    if response.status_code == 429:
+        metrics.count("gpt_rate_limited_total")
+
+def get_client():
+    """OpenAI client, created on first use so that importing this module stays cheap."""
+    global _client
+    if _client is None:
+        from openai import OpenAI, DefaultHttpxClient
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        # Set up OpenAI API key. The SDK retries rate limits and server errors itself,
+        # with exponential backoff and Retry-After; the event hooks let us count and time its requests.
+        _client = OpenAI(
+          api_key=os.getenv("OPENAI_API_KEY"),
+          http_client=DefaultHttpxClient(event_hooks={"request": [_on_request], "response": [_on_response]})
+        )
+    return _client
 
 # Configuration
 INPUT_DIR = "resources_extracted_segments"  # File containing the JSON objects
 OUTPUT_DIR = "resources_processed_segments"  # Final transformed file
 LOG_DIR = "process_log"
 TOKEN_LIMIT = 2000  # Sensible limit on tokens per API call
-MAX_RETRIES = 3  # Number of retries for API calls
+MAX_RETRIES = 3  # Attempts per record; each API call is also retried by the SDK
 
 instruction = """The following is a JSON object. Your job is to process it into a JSON object with fields title,author,date,abstract,tags. Multiple authors must be given as a list. Avoid obvious mistakes in the titles and authors. Include no text besides the processed JSON object. Incorporate all available information. Besides url,type,uuid, the other fields may be incorrect. The abstract should be of paragraph length. Use the text's own words whenever possible in the abstract. If an abstract is in the text itself, use the abstract **verbatim**, correcting any typographical errors but performing absolutely no revision of the content unless the text itself has no abstract or introduction. Remove obvious text processing artifacts. The tags should be very high-level, like "math", "finance", "blog", etc, and prefer nouns to verbs. Date should be YYYY-MM-DD when defined."""
 
@@ -29,19 +56,31 @@ def transform_json_object(json_obj):
     )
     response, json_response = None, None
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a highly capable assistant. It is of critical importance that you return valid JSON responses ONLY."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=TOKEN_LIMIT
-        )
+        client = get_client()
+        sent = _requests
+        try:
+            # The whole call, including the SDK's retries and backoff
+            with metrics.timer("gpt_call_seconds"):
+                response = client.chat.completions.create(
+                    model="gpt-4o-mini",
+                    messages=[
+                        {"role": "system", "content": "You are a highly capable assistant. It is of critical importance that you return valid JSON responses ONLY."},
+                        {"role": "user", "content": prompt}
+                    ],
+                    max_tokens=TOKEN_LIMIT
+                )
+        finally:
+            if _requests - sent > 1:
+                metrics.count("gpt_http_retries_total", _requests - sent - 1)
+        if response.usage:
+            metrics.count("gpt_prompt_tokens_total", response.usage.prompt_tokens)
+            metrics.count("gpt_completion_tokens_total", response.usage.completion_tokens)
         logging.info(f"Received gpt response successfully: {json_obj.get('uuid', 'unknown')}")
         json_response = json.loads(response.choices[0].message.content)
         logging.info(f"Processed JSON object successfully: {json_obj.get('uuid', 'unknown')}")
         return json_response
     except Exception as e:
+        metrics.count("gpt_errors_total")
         logging.error(f"Error processing JSON object {json_obj.get('uuid', 'unknown')}: {e}")
         logging.error(f"Dump response: {response}")
         return None
@@ -54,30 +93,32 @@ def process_json_file(input_file, output_file, log_file):
         level=logging.INFO,
         format="%(asctime)s - %(levelname)s - %(message)s"
     )
-    logging.info(f"Started processing {os.path.join(INPUT_DIR, args.INPUT_FILE)}.")
+    logging.info(f"Started processing {os.path.join(INPUT_DIR, input_file)}.")
     # Load input file
     with open(os.path.join(INPUT_DIR, input_file), "r") as f:
         json_objects = json.load(f)
 
     processed_objects = []
     for i, json_obj in enumerate(json_objects):
-        retries = 0
-        while retries < MAX_RETRIES:
-            transformed_obj = transform_json_object(json_obj)
-            if transformed_obj:
-                transformed_obj["url"] = json_obj["url"]
-                transformed_obj["type"] = json_obj["type"]
-                transformed_obj["uuid"] = json_obj["uuid"]
-                processed_objects.append(transformed_obj)
-                break
-            else:
-                retries += 1
-                logging.warning(f"Retrying ({retries}/{MAX_RETRIES}) for object {i+1}...")
+        attempts = 0
+        with metrics.record("gpt_process", json_obj.get("uuid", i)):
+            while True:
+                attempts += 1
+                transformed_obj = transform_json_object(json_obj)
+                if transformed_obj:
+                    transformed_obj["url"] = json_obj["url"]
+                    transformed_obj["type"] = json_obj["type"]
+                    transformed_obj["uuid"] = json_obj["uuid"]
+                    processed_objects.append(transformed_obj)
+                    break
+                if attempts == MAX_RETRIES:
+                    metrics.count("gpt_failed_records_total")
+                    logging.error(f"Failed to process object {i+1} after {MAX_RETRIES} attempts.")
+                    break
+                metrics.count("gpt_record_retries_total")
+                logging.warning(f"Retrying ({attempts}/{MAX_RETRIES - 1}) for object {i+1}...")
                 time.sleep(1)  # Wait before retry
 
-        if retries == MAX_RETRIES:
-            logging.error(f"Failed to process object {i+1} after {MAX_RETRIES} retries.")
-
 
     # Save final output
     with open(os.path.join(OUTPUT_DIR, output_file), "w") as output_f:
@@ -85,11 +126,15 @@ def process_json_file(input_file, output_file, log_file):
 
     logging.info(f"Processing complete. Final output saved to {os.path.join(OUTPUT_DIR, output_file)}")
 
-if __name__ == "__main__":
+def main(argv=None):
     parser = argparse.ArgumentParser(description="Process a JSON file.")
     parser.add_argument("INPUT_FILE", help="Name of the input JSON file.")
     parser.add_argument("OUTPUT_FILE", help="Name of the output file.")
     parser.add_argument("LOG_FILE", help="Name of the log file.")
 
-    args = parser.parse_args()
-    process_json_file(args.INPUT_FILE, args.OUTPUT_FILE, args.LOG_FILE)
+    args = parser.parse_args(argv)
+    with metrics.stage("gpt_process"):
+        process_json_file(args.INPUT_FILE, args.OUTPUT_FILE, args.LOG_FILE)
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,91 @@
 import os
+import re
+import glob
 import json
-from datetime import datetime
-
-def parse_date(date_str):
-    """Try parsing the date in various formats."""
-    if not isinstance(date_str, str) or not date_str.strip():
-        return date_str  # Return the original value if it's not a valid string
-    formats = [
-        "%B %d, %Y", "%b %d, %Y", "%B %Y", "%b %Y", 
-        "%d %B %Y", "%d %b %Y", "%Y-%m-%d", "%Y-%m", "%Y"
-    ]
-    for fmt in formats:
-        try:
-            return datetime.strptime(date_str, fmt).strftime("%Y-%m-%d")
-        except ValueError:
-            continue
-    return date_str  # Return the original string if no format matches
+import argparse
+from dates import parse_date
+from dedup import propagate_metadata, GENERIC_JSON, ARXIV_JSON
 
 # Directory containing JSON files
-directory = "resources_processed_segments"
-output_file = "merged.json"
-merged_data = []
-
-# Loop through the files and merge them
-for i in range(10):  # Assuming files are named segment_0.json to segment_9.json
-    file_path = os.path.join(directory, f"segment_{i}.json")
-    with open(file_path, "r") as f:
-        data = json.load(f)
-        # Correct dates in the data
-        for entry in data:
-            if "date" in entry:  # Assuming the key for dates is 'date'
+DIRECTORY = "resources_processed_segments"
+OUTPUT_FILE = "merged.json"
+DUPLICATES_FILE = "duplicates.json"
+
+def segment_files(directory):
+    """segment_<n>.json files in directory, in numeric order."""
+    def number(path):
+        match = re.search(r"segment_(\d+)\.json$", path)
+        return int(match.group(1)) if match else -1
+    return sorted(glob.glob(os.path.join(directory, "segment_*.json")), key=number)
+
+def merge_segments(directory=DIRECTORY, output_file=OUTPUT_FILE, duplicates_file=DUPLICATES_FILE,
+                   generic_json=GENERIC_JSON, arxiv_json=ARXIV_JSON):
+    merged_data = []
+
+    # Loop through the files and merge them
+    for file_path in segment_files(directory):
+        with open(file_path, "r") as f:
+            data = json.load(f)
+            # Correct dates in the data
+            for entry in data:
+                if "date" in entry:  # Assuming the key for dates is 'date'
+                    entry["date"] = parse_date(entry.get("date"))
+            merged_data.extend(data)
+
+    # Fill in the near-duplicates that dedup.py held back from gpt
+    if os.path.exists(duplicates_file):
+        with open(duplicates_file, "r") as f:
+            clusters = json.load(f)
+        generic_records = []
+        if os.path.exists(generic_json):
+            with open(generic_json, "r") as f:
+                generic_records = json.load(f)
+        arxiv_records = []
+        if os.path.exists(arxiv_json):
+            with open(arxiv_json, "r") as f:
+                arxiv_records = json.load(f)
+        for entry in propagate_metadata(merged_data, clusters, arxiv_records, generic_records):
+            if "date" in entry:
                 entry["date"] = parse_date(entry.get("date"))
-        merged_data.extend(data)
+            merged_data.append(entry)
+
+    # Write the merged data to a single JSON file
+    with open(output_file, "w") as f:
+        json.dump(merged_data, f, indent=4)
+    return merged_data
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge the gpt_process.py segments into one JSON file.")
+    parser.add_argument(
+        "--directory",
+        default=DIRECTORY,
+        help=f"Directory containing the processed segments. Default is '{DIRECTORY}'."
+    )
+    parser.add_argument(
+        "--output_file",
+        default=OUTPUT_FILE,
+        help=f"Path to the merged JSON file. Default is '{OUTPUT_FILE}'."
+    )
+    parser.add_argument(
+        "--duplicates_file",
+        default=DUPLICATES_FILE,
+        help=f"Duplicate clusters written by dedup.py. Default is '{DUPLICATES_FILE}'."
+    )
+    parser.add_argument(
+        "--generic_json",
+        default=GENERIC_JSON,
+        help=f"Extracted non-arXiv resources that dedup.py read. Default is '{GENERIC_JSON}'."
+    )
+    parser.add_argument(
+        "--arxiv_json",
+        default=ARXIV_JSON,
+        help=f"arXiv records that dedup.py read. Default is '{ARXIV_JSON}'."
+    )
+    args = parser.parse_args(argv)
+    merged_data = merge_segments(
+        args.directory, args.output_file, args.duplicates_file, args.generic_json, args.arxiv_json
+    )
+    print(f"Merged {len(merged_data)} records into {args.output_file}")
 
-# Write the merged data to a single JSON file
-with open(output_file, "w") as f:
-    json.dump(merged_data, f, indent=4)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+# Shared instrumentation for the pipeline stages.
+#
+# Counters and timers live in one process-wide registry, keyed by metric name and
+# labels (e.g. host, type). Each stage wraps its run in `with metrics.stage("name"):`,
+# which clears the registry when the stage starts and writes <stage>.prom (Prometheus
+# text format, for node_exporter's textfile collector) and <stage>.json to METRICS_DIR
+# when it finishes, so each stage's files hold only its own series.
+#
+# Optional profiling, configured through environment variables:
+#   URLDASH_METRICS_DIR      output directory (default "metrics")
+#   URLDASH_PROFILE_SLOW     seconds; records slower than this get a cProfile dump
+#   URLDASH_SAMPLE_INTERVAL  seconds; sample the stack this often and write <stage>.folded
+import os
+import re
+import json
+import time
+import random
+import signal
+import cProfile
+import threading
+from contextlib import contextmanager
+from collections import Counter
+
+METRICS_DIR = os.environ.get("URLDASH_METRICS_DIR", "metrics")
+PROFILE_SLOW = float(os.environ.get("URLDASH_PROFILE_SLOW", 0))
+SAMPLE_INTERVAL = float(os.environ.get("URLDASH_SAMPLE_INTERVAL", 0))
+MAX_SAMPLES = 10000  # reservoir size per timer, for quantiles
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+_lock = threading.Lock()
+_counters = {}
+_timers = {}
+_profiling = threading.local()
+_stack_samples = Counter()
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+class _Timer:
+    """Count, sum, min, max and a uniform reservoir of observations."""
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+        self.samples = []
+
+    def add(self, value):
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(value)
+        else:
+            i = random.randrange(self.count)
+            if i < MAX_SAMPLES:
+                self.samples[i] = value
+
+    def quantile(self, q):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def count(name, value=1, **labels):
+    """Add value to the counter name{labels}."""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def observe(name, seconds, **labels):
+    """Record one duration for the timer name{labels}."""
+    key = _key(name, labels)
+    with _lock:
+        timer = _timers.get(key)
+        if timer is None:
+            timer = _timers[key] = _Timer()
+        timer.add(seconds)
+
+@contextmanager
+def timer(name, **labels):
+    """Time the enclosed block into name{labels}, also when it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+@contextmanager
+def record(stage, key):
+    """
+    Time the processing of one record into record_seconds{stage}.
+    If URLDASH_PROFILE_SLOW is set, the record is run under cProfile and the
+    profile is kept in METRICS_DIR/profiles when it took longer than that.
+    """
+    profiler = None
+    if PROFILE_SLOW > 0 and not getattr(_profiling, "active", False):
+        profiler = cProfile.Profile()
+        _profiling.active = True
+        profiler.enable()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        observe("record_seconds", elapsed, stage=stage)
+        if profiler is not None:
+            profiler.disable()
+            _profiling.active = False
+            if elapsed > PROFILE_SLOW:
+                profile_dir = os.path.join(METRICS_DIR, "profiles")
+                os.makedirs(profile_dir, exist_ok=True)
+                name = re.sub(r"[^A-Za-z0-9._-]+", "_", str(key))[-100:]
+                profiler.dump_stats(os.path.join(profile_dir, f"{stage}-{name}.prof"))
+                count("slow_records_total", stage=stage)
+
+def _sample_stack(signum, frame):
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    _stack_samples[";".join(reversed(stack))] += 1
+
+def start_sampling(interval=SAMPLE_INTERVAL):
+    """Sample the main thread's stack every interval seconds of CPU time (Unix only)."""
+    _stack_samples.clear()
+    signal.signal(signal.SIGPROF, _sample_stack)
+    signal.setitimer(signal.ITIMER_PROF, interval, interval)
+
+def stop_sampling(path):
+    """Stop sampling and write the samples in folded-stack format (input for flamegraph.pl or speedscope)."""
+    signal.setitimer(signal.ITIMER_PROF, 0, 0)
+    signal.signal(signal.SIGPROF, signal.SIG_DFL)
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, n in _stack_samples.most_common():
+            f.write(f"{stack} {n}\n")
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+def to_prometheus():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        seen = set()
+        for (name, labels), value in sorted(_counters.items()):
+            metric = f"urldash_{name}"
+            if metric not in seen:
+                lines.append(f"# TYPE {metric} counter")
+                seen.add(metric)
+            lines.append(f"{metric}{_labels(labels)} {value}")
+        for (name, labels), t in sorted(_timers.items()):
+            metric = f"urldash_{name}"
+            if metric not in seen:
+                lines.append(f"# TYPE {metric} summary")
+                seen.add(metric)
+            for q in QUANTILES:
+                value = t.quantile(q)
+                lines.append(f"{metric}{_labels(labels, [('quantile', str(q))])} {'NaN' if value is None else value}")
+            lines.append(f"{metric}_sum{_labels(labels)} {t.sum}")
+            lines.append(f"{metric}_count{_labels(labels)} {t.count}")
+    return "\n".join(lines) + "\n"
+
+def snapshot():
+    """All metrics as a JSON-serializable dict."""
+    with _lock:
+        return {
+            "counters": [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(_counters.items())
+            ],
+            "timers": [
+                {
+                    "name": name, "labels": dict(labels), "count": t.count, "sum": t.sum,
+                    "min": t.min, "max": t.max,
+                    **{f"p{int(q * 100)}": t.quantile(q) for q in QUANTILES},
+                }
+                for (name, labels), t in sorted(_timers.items())
+            ],
+        }
+
+def export(stage, directory=None):
+    """Write <stage>.prom and <stage>.json to directory (METRICS_DIR by default)."""
+    directory = directory or METRICS_DIR
+    os.makedirs(directory, exist_ok=True)
+    # Write then rename, so the textfile collector never reads a partial file
+    prom_path = os.path.join(directory, f"{stage}.prom")
+    with open(prom_path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(to_prometheus())
+    os.replace(prom_path + ".tmp", prom_path)
+    with open(os.path.join(directory, f"{stage}.json"), "w", encoding="utf-8") as f:
+        json.dump(snapshot(), f, indent=2)
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _timers.clear()
+
+@contextmanager
+def stage(name):
+    """
+    Time a whole stage run, with optional stack sampling, and export its metrics at the end.
+    Metrics recorded before the stage starts, e.g. by an earlier stage in the same process, are dropped.
+    """
+    reset()
+    sampling = SAMPLE_INTERVAL > 0 and threading.current_thread() is threading.main_thread()
+    if sampling:
+        start_sampling()
+    try:
+        with timer("stage_seconds", stage=name):
+            yield
+    finally:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        if sampling:
+            stop_sampling(os.path.join(METRICS_DIR, f"{name}.folded"))
+        export(name)
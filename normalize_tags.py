@@ -1,34 +1,68 @@
 import json
+import argparse
+from tag_vocab import TagVocabulary, VOCABULARY_FILE
 
-def normalize_tags(data):
+def normalize_tags(data, vocabulary):
     """
-    Normalize the tags in the dataset to ensure consistent capitalization.
-    Converts all tags to lowercase.
-    
+    Normalize the tags in the dataset against the tag vocabulary.
+    Spelling variants, aliases ("ml") and near-duplicates ("machine-learning") are
+    merged into one canonical tag, and each entry gets the integer ids of its tags.
+
     Parameters:
         data (list): List of dictionaries containing a 'tags' key.
+        vocabulary (TagVocabulary): Vocabulary to resolve tags with; new tags and aliases are added to it.
 
     Returns:
-        list: Updated data with normalized tags.
+        list: Updated data with canonical 'tags' and matching 'tag_ids'.
     """
-    for entry in data:
-        if "tags" in entry and isinstance(entry["tags"], list):
-            # Normalize tags to lowercase
-            entry["tags"] = list(set(tag.lower() for tag in entry["tags"]))
+    entries = [entry for entry in data if isinstance(entry.get("tags"), list)]
+    vocabulary.merge_similar(tag for entry in entries for tag in entry["tags"])
+    for entry in entries:
+        tag_ids = []
+        for tag in entry["tags"]:
+            tag_id = vocabulary.intern(tag)
+            if tag_id not in tag_ids:
+                tag_ids.append(tag_id)
+        entry["tags"] = [vocabulary.name(tag_id) for tag_id in tag_ids]
+        entry["tag_ids"] = tag_ids
     return data
 
-# Load JSON data from a file
-input_file = "merged.json"  # Replace with your input file
-output_file = "merged_normalized_tags.json"  # Replace with your desired output file
+INPUT_FILE = "merged.json"
+OUTPUT_FILE = "merged_normalized_tags.json"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Normalize tags against the tag vocabulary.")
+    parser.add_argument(
+        "--input_file",
+        default=INPUT_FILE,
+        help=f"Path to the merged JSON file. Default is '{INPUT_FILE}'."
+    )
+    parser.add_argument(
+        "--output_file",
+        default=OUTPUT_FILE,
+        help=f"Path to the output JSON file. Default is '{OUTPUT_FILE}'."
+    )
+    parser.add_argument(
+        "--vocabulary",
+        default=VOCABULARY_FILE,
+        help=f"Path to the tag vocabulary. Default is '{VOCABULARY_FILE}'."
+    )
+    args = parser.parse_args(argv)
+
+    # Load JSON data from a file
+    with open(args.input_file, "r") as f:
+        data = json.load(f)
 
-with open(input_file, "r") as f:
-    data = json.load(f)
+    # Normalize tags
+    vocabulary = TagVocabulary.load(args.vocabulary)
+    normalized_data = normalize_tags(data, vocabulary)
+    vocabulary.save(args.vocabulary)
 
-# Normalize tags
-normalized_data = normalize_tags(data)
+    # Write normalized data to a new JSON file
+    with open(args.output_file, "w") as f:
+        json.dump(normalized_data, f, indent=4)
 
-# Write normalized data to a new JSON file
-with open(output_file, "w") as f:
-    json.dump(normalized_data, f, indent=4)
+    print(f"Tags normalized. Updated file saved as {args.output_file}; vocabulary saved as {args.vocabulary}.")
 
-print(f"Tags normalized. Updated file saved as {output_file}.")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import io
+import os
+import mmap
+import logging
+import importlib.util
+from contextlib import contextmanager
+import metrics
+
+# PDF parsers are imported in the functions that use them. BACKEND picks the parser for
+# metadata and page text: "auto" uses the first installed of BACKENDS (fastest first),
+# PyPDF2 being the fallback.
+BACKEND = os.environ.get("URLDASH_PDF_BACKEND", "auto")
+BACKENDS = ["pymupdf", "pypdfium2", "pypdf2"]
+MODULES = {"pymupdf": ("pymupdf", "fitz"), "pypdfium2": ("pypdfium2",), "pypdf2": ("PyPDF2",)}
+
+_missing_warned = set()  # requested backends already reported as not installed
+
+def available_backends():
+    return [name for name in BACKENDS if any(importlib.util.find_spec(module) for module in MODULES[name])]
+
+def choose_backend(name=None):
+    """Installed backend to use for name (default BACKEND), falling back to PyPDF2."""
+    name = (name or BACKEND).lower()
+    installed = available_backends()
+    if name == "auto":
+        return installed[0] if installed else "pypdf2"
+    if name not in installed:
+        fallback = installed[0] if installed else "pypdf2"
+        if name not in _missing_warned:
+            _missing_warned.add(name)
+            logging.warning(f"PDF backend {name} is not installed; using {fallback}")
+        return fallback
+    return name
+
+@contextmanager
+def open_pdf(source):
+    """
+    Yield the bytes of a PDF without copying them: source itself if it is bytes-like,
+    otherwise a read-only memory map of the file at path source.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        yield source
+        return
+    with open(source, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield data
+
+# --- backends ---
+
+def _import_pymupdf():
+    try:
+        import pymupdf
+    except ImportError:  # releases before 1.24 only have the fitz name
+        import fitz as pymupdf
+    return pymupdf
+
+def _native_source(source):
+    # Native backends open paths themselves; bytes are handed over as they are
+    return bytes(source) if isinstance(source, memoryview) else source
+
+def _pymupdf_open(source):
+    pymupdf = _import_pymupdf()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return pymupdf.open(stream=_native_source(source), filetype="pdf")
+    return pymupdf.open(source)
+
+def _pypdfium2_open(source):
+    import pypdfium2
+    return pypdfium2.PdfDocument(_native_source(source))
+
+def _pypdf2_open(data):
+    import PyPDF2
+    # A memory map reads like a file, so PyPDF2 seeks through it instead of copying it
+    return PyPDF2.PdfReader(data if hasattr(data, "read") else io.BytesIO(data))
+
+@contextmanager
+def _document(backend, source):
+    """
+    The PDF at path source (or in bytes source) opened with backend. Native backends
+    read the file themselves; PyPDF2 reads a memory map of it.
+    """
+    if backend == "pymupdf":
+        doc = _pymupdf_open(source)
+    elif backend == "pypdfium2":
+        doc = _pypdfium2_open(source)
+    else:
+        with open_pdf(source) as data:
+            yield _pypdf2_open(data)
+        return
+    try:
+        yield doc
+    finally:
+        doc.close()
+
+def _info(backend, doc):
+    """{"Title": ..., "Author": ..., "CreationDate": ...} of an open document; none of the backends parses pages for it."""
+    if backend == "pymupdf":
+        meta = doc.metadata or {}
+        return {"Title": meta.get("title", ""), "Author": meta.get("author", ""), "CreationDate": meta.get("creationDate", "")}
+    if backend == "pypdfium2":
+        return doc.get_metadata_dict()
+    info = doc.metadata or {}
+    # items() leaves indirect references unresolved
+    return {key.lstrip("/"): str(value.get_object()) for key, value in info.items()}
+
+def _metadata(backend, doc):
+    info = _info(backend, doc)
+    metrics.count("pdf_metadata_total", backend=backend)
+    return {
+        "title": (info.get("Title") or "").strip(),
+        "author": (info.get("Author") or "").strip(),
+        "creation_date": (info.get("CreationDate") or "").strip(),
+    }
+
+def _page_texts(backend, doc, max_pages):
+    if backend == "pymupdf":
+        pages = doc.page_count
+        read = lambda n: doc[n].get_text()
+    elif backend == "pypdfium2":
+        pages = len(doc)
+
+        def read(n):
+            page = doc[n]
+            textpage = page.get_textpage()
+            try:
+                return textpage.get_text_range()
+            finally:
+                textpage.close()
+                page.close()
+    else:
+        pages = len(doc.pages)
+        read = lambda n: doc.pages[n].extract_text()
+    for n in range(pages if max_pages is None else min(pages, max_pages)):
+        with metrics.timer("extract_page_seconds", type="pdf"):
+            text = read(n)
+        yield text
+
+def metadata(source, backend=None):
+    """{"title", "author", "creation_date"} of the PDF at path source (or in bytes source), from its Info dictionary."""
+    backend = choose_backend(backend)
+    with _document(backend, source) as doc:
+        return _metadata(backend, doc)
+
+def page_texts(source, max_pages=None, backend=None):
+    """Yield the text of the first max_pages pages (all if None) of the PDF at path source (or in bytes source)."""
+    backend = choose_backend(backend)
+    with _document(backend, source) as doc:
+        yield from _page_texts(backend, doc, max_pages)
+
+@contextmanager
+def read_pdf(source, max_pages=None, backend=None):
+    """
+    Open the PDF at path source (or in bytes source) once and yield (metadata(), page_texts()) of it.
+    The page texts are read lazily, so they must be consumed inside the with block.
+    """
+    backend = choose_backend(backend)
+    with _document(backend, source) as doc:
+        yield _metadata(backend, doc), _page_texts(backend, doc, max_pages)
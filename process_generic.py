@@ -1,22 +1,16 @@
 import json
 import re
 import logging
+import argparse
 from pathlib import Path
-from bs4 import BeautifulSoup
-import PyPDF2
+from dates import parse_date
+import metrics
+import pdf_access
 
 INPUT_JSON = "non_arxiv_output.json"
 OUTPUT_JSON = "resources_extracted.json"
-
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[
-        logging.FileHandler("extraction.log"),
-        logging.StreamHandler()
-    ]
-)
+LOGFILE = "extraction.log"
+PDF_PAGES = 22  # pages read per PDF; only the first 2000 words are kept
 
 def truncate_to_2000_words(text: str) -> str:
     """Utility: extract plain text up to 2000 words"""
@@ -26,7 +20,7 @@ def truncate_to_2000_words(text: str) -> str:
 
 def extract_from_pdf(pdf_path: Path):
     """
-    Extract (title, author, date, text) from PDF using PyPDF2 doc info (if available).
+    Extract (title, author, date, text) from PDF using its doc info (if available).
     Returns (title, author, date, first_2000_words).
     """
     logging.info(f"Processing PDF: {pdf_path}")
@@ -34,23 +28,15 @@ def extract_from_pdf(pdf_path: Path):
     text_chunks = []
 
     try:
-        with open(pdf_path, 'rb') as f:
-            reader = PyPDF2.PdfReader(f)
-            # Attempt metadata from the PDF's DocumentInfo
-            info = reader.metadata
-
-            # Sanitize metadata fields
-            title = str(info.title) if info and hasattr(info, 'title') else ""
-            author = str(info.author) if info and hasattr(info, 'author') else ""
-            date = str(info.get('/CreationDate', "")) if info else ""
+        # One open serves the DocumentInfo metadata (read without parsing pages) and the text
+        with pdf_access.read_pdf(pdf_path, max_pages=PDF_PAGES) as (info, pages):
+            title, author = info["title"], info["author"]
+            date = parse_date(info["creation_date"])
 
             # Extract text
-            for n, page in enumerate(reader.pages):
-                page_text = page.extract_text()
+            for page_text in pages:
                 if page_text:
                     text_chunks.append(page_text)
-                if n > 20:
-                    break
 
         full_text = " ".join(text_chunks)
         return title, author, date, truncate_to_2000_words(full_text)
@@ -65,6 +51,8 @@ def extract_from_html(html_path: Path):
     Tries to find <title>, <meta name='author'>, <meta name='date'>, etc.
     Returns (title, author, date, first_2000_words).
     """
+    from bs4 import BeautifulSoup
+
     logging.info(f"Processing HTML: {html_path}")
     title, author, date = "", "", ""
 
@@ -107,10 +95,12 @@ def process_resource(resource: dict):
     logging.info(f"Processing resource: {file_path} ({resource['type']})")
 
     try:
-        if resource["type"].upper() == "PDF":
-            title, author, date, text = extract_from_pdf(file_path)
-        else:
-            title, author, date, text = extract_from_html(file_path)
+        with metrics.record("process_generic", file_path), \
+                metrics.timer("extract_document_seconds", type=resource["type"].lower()):
+            if resource["type"].upper() == "PDF":
+                title, author, date, text = extract_from_pdf(file_path)
+            else:
+                title, author, date, text = extract_from_html(file_path)
 
         resource["extracted_title"] = title
         resource["extracted_author"] = author
@@ -121,16 +111,16 @@ def process_resource(resource: dict):
         logging.error(f"Failed to process resource {file_path}: {e}")
         return resource
 
-def main():
-
+def extract_resources(input_json=INPUT_JSON, output_json=OUTPUT_JSON):
+    """Add extracted title, author, date and text to every resource in input_json and write output_json."""
     logging.info("Starting resource extraction")
 
     # Load the original resource list
     try:
-        with open(INPUT_JSON, "r", encoding="utf-8") as f:
+        with open(input_json, "r", encoding="utf-8") as f:
             resources = json.load(f)
     except Exception as e:
-        logging.critical(f"Failed to load input JSON {INPUT_JSON}: {e}")
+        logging.critical(f"Failed to load input JSON {input_json}: {e}")
         return
 
     # Use multiprocessing for faster extraction
@@ -145,11 +135,38 @@ def main():
             """Convert non-serializable objects to strings."""
             return str(obj) if not isinstance(obj, (str, int, float, list, dict, bool, type(None))) else obj
 
-        with open(OUTPUT_JSON, "w", encoding="utf-8") as f:
+        with open(output_json, "w", encoding="utf-8") as f:
             json.dump(results, f, indent=2, ensure_ascii=False, default=custom_serializer)
-        logging.info(f"Extraction completed successfully. Results saved to {OUTPUT_JSON}")
+        logging.info(f"Extraction completed successfully. Results saved to {output_json}")
     except Exception as e:
-        logging.critical(f"Failed to write output JSON {OUTPUT_JSON}: {e}")
+        logging.critical(f"Failed to write output JSON {output_json}: {e}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract title, author, date and text from downloaded resources.")
+    parser.add_argument(
+        "--input_json",
+        default=INPUT_JSON,
+        help=f"Path to the output of generic.py. Default is '{INPUT_JSON}'."
+    )
+    parser.add_argument(
+        "--output_json",
+        default=OUTPUT_JSON,
+        help=f"Path to the output JSON file. Default is '{OUTPUT_JSON}'."
+    )
+    args = parser.parse_args(argv)
+
+    # Set up logging
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(message)s",
+        handlers=[
+            logging.FileHandler(LOGFILE),
+            logging.StreamHandler()
+        ]
+    )
+
+    with metrics.stage("process_generic"):
+        extract_resources(args.input_json, args.output_json)
 
 if __name__ == "__main__":
     main()
@@ -1,18 +1,54 @@
 import json
 import re
+import argparse
+from tag_vocab import TagVocabulary, VOCABULARY_FILE, arxiv_tags
 
-# Load the JSON file
-with open("output_tags.json", "r") as infile:
-    data = json.load(infile)
+INPUT_JSON = "output_tags.json"
+OUTPUT_JSON = "output_tags_clean.json"
 
-# Regex pattern for valid tags of the form subj.ABC
-valid_tag_pattern = re.compile(r"^[a-z-]+\.[A-Z]+$")
-# Process the JSON
-for entry in data:
-    entry["tags"] = [tag for tag in entry["tags"] if valid_tag_pattern.match(tag)]
+# Regex pattern for arXiv categories of the form subj.ABC, subj.sub-ject or subj-ph; drops MSC/ACM classes
+valid_tag_pattern = re.compile(r"^[a-z-]+(\.[A-Za-z-]+)?$")
 
-# Save the filtered JSON
-with open("output_tags_clean.json", "w") as outfile:
-    json.dump(data, outfile, indent=4)
+def process_tags(data, vocabulary):
+    """Keep the arXiv category codes and map them to the same high-level tags gpt produces."""
+    for entry in data:
+        entry["categories"] = [tag for tag in entry["tags"] if valid_tag_pattern.match(tag)]
+        entry["tags"] = arxiv_tags(entry["categories"])
+        entry["tag_ids"] = [vocabulary.intern(tag) for tag in entry["tags"]]
+    return data
 
-print("Tags have been filtered and saved to output_tags_clean.json.")
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Map arXiv categories in the arxiv.py output to tags.")
+    parser.add_argument(
+        "--input_json",
+        default=INPUT_JSON,
+        help=f"Path to the output of arxiv.py. Default is '{INPUT_JSON}'."
+    )
+    parser.add_argument(
+        "--output_json",
+        default=OUTPUT_JSON,
+        help=f"Path to the output JSON file. Default is '{OUTPUT_JSON}'."
+    )
+    parser.add_argument(
+        "--vocabulary",
+        default=VOCABULARY_FILE,
+        help=f"Path to the tag vocabulary. Default is '{VOCABULARY_FILE}'."
+    )
+    args = parser.parse_args(argv)
+
+    # Load the JSON file
+    with open(args.input_json, "r") as infile:
+        data = json.load(infile)
+
+    vocabulary = TagVocabulary.load(args.vocabulary)
+    process_tags(data, vocabulary)
+    vocabulary.save(args.vocabulary)
+
+    # Save the filtered JSON
+    with open(args.output_json, "w") as outfile:
+        json.dump(data, outfile, indent=4)
+
+    print(f"Tags have been mapped and saved to {args.output_json}.")
+
+if __name__ == "__main__":
+    main()
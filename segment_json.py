@@ -1,6 +1,7 @@
 import json
 import math
 import os
+import argparse
 
 def segment_json_file(input_file, output_dir, num_segments=10):
     """
@@ -43,7 +44,29 @@ def segment_json_file(input_file, output_dir, num_segments=10):
 
     print("Segmentation complete!")
 
-# Example usage
-input_file = 'resources_extracted.json'  # Path to the input JSON file
-output_dir = 'resources_extracted_segments'  # Directory to save the smaller files
-segment_json_file(input_file, output_dir)
+INPUT_FILE = 'resources_deduplicated.json'  # Path to the input JSON file, written by dedup.py
+OUTPUT_DIR = 'resources_extracted_segments'  # Directory to save the smaller files
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Split a JSON array into segments for gpt_process.py.")
+    parser.add_argument(
+        "--input_file",
+        default=INPUT_FILE,
+        help=f"Path to the input JSON file. Default is '{INPUT_FILE}'."
+    )
+    parser.add_argument(
+        "--output_dir",
+        default=OUTPUT_DIR,
+        help=f"Directory to save the segments in. Default is '{OUTPUT_DIR}'."
+    )
+    parser.add_argument(
+        "--num_segments",
+        type=int,
+        default=10,
+        help="Number of segments. Default is 10."
+    )
+    args = parser.parse_args(argv)
+    segment_json_file(args.input_file, args.output_dir, args.num_segments)
+
+if __name__ == "__main__":
+    main()
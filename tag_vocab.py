@@ -0,0 +1,288 @@
+import os
+import re
+import json
+from collections import Counter, defaultdict
+
+VOCABULARY_FILE = "tag_vocabulary.json"
+
+# Hand-maintained aliases, applied before fuzzy merging. Keys and values are canonical forms.
+ALIASES = {
+    "ml": "machine learning",
+    "ai": "artificial intelligence",
+    "dl": "deep learning",
+    "nlp": "natural language processing",
+    "rl": "reinforcement learning",
+    "cv": "computer vision",
+    "llm": "large language models",
+    "llms": "large language models",
+    "stats": "statistics",
+    "maths": "math",
+    "mathematics": "math",
+    "econ": "economics",
+    "quant finance": "quantitative finance",
+    "cs": "computer science",
+    "prob": "probability",
+}
+
+# arXiv archives (the part before the dot) and their high-level tags
+ARXIV_ARCHIVES = {
+    "math": ["math"],
+    "cs": ["computer science"],
+    "stat": ["statistics"],
+    "q-fin": ["finance"],
+    "econ": ["economics"],
+    "q-bio": ["biology"],
+    "eess": ["engineering"],
+    "physics": ["physics"],
+    "astro-ph": ["physics", "astronomy"],
+    "cond-mat": ["physics"],
+    "gr-qc": ["physics"],
+    "hep-ex": ["physics"],
+    "hep-lat": ["physics"],
+    "hep-ph": ["physics"],
+    "hep-th": ["physics"],
+    "math-ph": ["physics", "math"],
+    "nlin": ["physics"],
+    "nucl-ex": ["physics"],
+    "nucl-th": ["physics"],
+    "quant-ph": ["physics", "quantum computing"],
+}
+
+# Finer-grained arXiv categories worth their own tag
+ARXIV_CATEGORIES = {
+    "cs.LG": ["machine learning"],
+    "stat.ML": ["machine learning"],
+    "cs.AI": ["artificial intelligence"],
+    "cs.CL": ["natural language processing"],
+    "cs.CV": ["computer vision"],
+    "cs.CR": ["security"],
+    "cs.DB": ["databases"],
+    "cs.DS": ["algorithms"],
+    "cs.PL": ["programming"],
+    "cs.DC": ["distributed systems"],
+    "math.PR": ["probability"],
+    "math.ST": ["statistics"],
+    "math.OC": ["optimization"],
+    "math.NT": ["number theory"],
+    "q-fin.CP": ["quantitative finance"],
+    "q-fin.MF": ["quantitative finance"],
+    "q-fin.PR": ["quantitative finance"],
+    "q-fin.ST": ["quantitative finance"],
+    "q-fin.RM": ["risk management"],
+    "q-fin.PM": ["portfolio management"],
+}
+
+# Fuzzy merging: only typos, one edit apart, between tags at least FUZZY_MIN_LENGTH long
+FUZZY_MIN_LENGTH = 5
+# Word prefixes that change the meaning: a tag is never merged with the same tag with one
+# of these added, removed or swapped ("supervised"/"unsupervised", "micro"/"macroeconomics")
+PREFIXES = ("a", "an", "anti", "bi", "de", "dis", "hyper", "hypo", "il", "im", "in", "inter", "intra", "ir",
+            "macro", "micro", "mono", "multi", "non", "over", "poly", "post", "pre", "semi", "sub", "super",
+            "un", "under", "uni")
+# Shorter acronyms ("go", "ai") are too ambiguous to merge; two-letter ones belong in ALIASES
+MIN_ACRONYM_LENGTH = 3
+
+def canonical_form(tag):
+    """Lowercase, treat '-' and '_' as spaces, collapse whitespace."""
+    return " ".join(re.sub(r"[-_]+", " ", str(tag).lower()).split())
+
+def arxiv_tags(categories):
+    """High-level tags for a list of arXiv category codes such as 'math.PR' or 'q-fin.ST'."""
+    tags = []
+    for category in categories:
+        archive = category.split(".")[0]
+        for tag in ARXIV_ARCHIVES.get(archive, []) + ARXIV_CATEGORIES.get(category, []):
+            if tag not in tags:
+                tags.append(tag)
+    return tags
+
+def singular(tag):
+    """Crude singular of the last word, used only to group candidate tags."""
+    words = tag.split()
+    last = words[-1]
+    if len(last) > 4 and last.endswith("ies"):
+        last = last[:-3] + "y"
+    elif len(last) > 3 and last.endswith("s") and not last.endswith(("ss", "us", "is")):
+        last = last[:-1]
+    return " ".join(words[:-1] + [last])
+
+def acronym(tag):
+    words = tag.split()
+    return "".join(w[0] for w in words) if len(words) > 1 else None
+
+# High-level tags of the arXiv mapping, preferred as canonical spellings
+ARXIV_TAGS = frozenset(tag for tags in list(ARXIV_ARCHIVES.values()) + list(ARXIV_CATEGORIES.values()) for tag in tags)
+
+def deletions(tag):
+    """tag and every string one character shorter; two tags one edit apart share one of these."""
+    return {tag} | {tag[:i] + tag[i + 1:] for i in range(len(tag))}
+
+def edit_position(a, b):
+    """
+    Position in the longer of a and b of the one inserted, deleted or substituted
+    character that tells them apart, or None if they are not exactly one edit apart.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    if a == b or len(a) - len(b) > 1:
+        return None
+    i = 0
+    while i < len(b) and a[i] == b[i]:
+        i += 1
+    rest = b[i + 1:] if len(a) == len(b) else b[i:]
+    return i if a[i + 1:] == rest else None
+
+def prefix_variants(a, b):
+    """Whether a word of a and the same word of b differ only by a prefix in PREFIXES."""
+    words_a, words_b = a.split(), b.split()
+    if len(words_a) != len(words_b):
+        return False
+    for x, y in zip(words_a, words_b):
+        if x == y:
+            continue
+        stems_x = {x} | {x[len(p):] for p in PREFIXES if x.startswith(p)}
+        stems_y = {y} | {y[len(p):] for p in PREFIXES if y.startswith(p)}
+        if stems_x & stems_y:
+            return True
+    return False
+
+def typo_variants(a, b):
+    """
+    Whether a and b look like two spellings of one tag: one edit apart, not at the
+    start of a word, not in a digit ("web2"/"web3") and not a swapped prefix.
+    """
+    i = edit_position(a, b)
+    if i is None:
+        return False
+    longer, shorter = (a, b) if len(a) >= len(b) else (b, a)
+    changed = longer[i] + (shorter[i] if len(a) == len(b) else "")
+    if i == 0 or longer[i - 1] == " " or any(c == " " or c.isdigit() for c in changed):
+        return False
+    return not prefix_variants(a, b)
+
+class TagVocabulary:
+    """
+    Interned tag table.
+
+    Every canonical tag has a stable integer id (its position in self.tags), and
+    self.aliases maps other spellings to a canonical tag. Ids never change once
+    assigned, so tag_ids stored in records stay valid as the vocabulary grows.
+    """
+
+    def __init__(self, tags=None, aliases=None):
+        self.tags = list(tags or [])
+        self.ids = {tag: i for i, tag in enumerate(self.tags)}
+        self.aliases = dict(ALIASES)
+        self.aliases.update(aliases or {})
+
+    def __len__(self):
+        return len(self.tags)
+
+    def resolve(self, tag):
+        """Canonical name for a raw tag, following aliases."""
+        name = canonical_form(tag)
+        seen = set()
+        while name in self.aliases and name not in seen:
+            seen.add(name)
+            name = self.aliases[name]
+        return name
+
+    def intern(self, tag):
+        """Id of the canonical tag for tag, adding it to the table if needed."""
+        name = self.resolve(tag)
+        tag_id = self.ids.get(name)
+        if tag_id is None:
+            tag_id = self.ids[name] = len(self.tags)
+            self.tags.append(name)
+        return tag_id
+
+    def name(self, tag_id):
+        return self.tags[tag_id]
+
+    def merge_similar(self, raw_tags):
+        """
+        Batch fuzzy merging. Groups the distinct tags in raw_tags (an iterable, with
+        repetitions counting as frequency) together with the tags that already have ids
+        by singular form, acronym and typos, and records an alias from every member of a
+        group to its preferred member: a tag that already has an id, else an arXiv tag or
+        alias target, else the most frequent, else the shortest. An acronym is aliased to
+        its expansion. A tag that already has an id is never aliased, so two of them are
+        never merged. Returns the number of aliases added.
+        """
+        counts = Counter(self.resolve(t) for t in raw_tags)
+        for tag in self.ids:
+            counts.setdefault(tag, 0)
+        preferred = ARXIV_TAGS | set(self.aliases.values())
+        names = sorted(counts, key=lambda t: (t not in self.ids, t not in preferred, -counts[t], len(t), t))
+        rank = {name: i for i, name in enumerate(names)}
+
+        parent = {name: name for name in names}
+
+        def find(name):
+            while parent[name] != name:
+                parent[name] = parent[parent[name]]
+                name = parent[name]
+            return name
+
+        def union(a, b, a_wins=False):
+            ra, rb = find(a), find(b)
+            if ra != rb and not (ra in self.ids and rb in self.ids):
+                # The preferred tag (earlier in names) becomes the root, unless a's group is
+                # to win; a tag with an id always does
+                if rb in self.ids or (not a_wins and rank[ra] > rank[rb]):
+                    ra, rb = rb, ra
+                parent[rb] = ra
+
+        # Same singular form or space-free spelling: "blogs"/"blog", "data base"/"database"
+        by_key = defaultdict(list)
+        for name in names:
+            by_key[singular(name).replace(" ", "")].append(name)
+        for group in by_key.values():
+            for other in group[1:]:
+                union(group[0], other)
+
+        # Acronyms of multi-word tags: "gnn" for "graph neural networks", only if the acronym is
+        # itself used and stands for exactly one tag ("sde" could be stochastic differential
+        # equations or software development engineering)
+        expansions = defaultdict(list)
+        for name in names:
+            short = acronym(name)
+            if short and short in parent and len(short) >= MIN_ACRONYM_LENGTH:
+                expansions[short].append(name)
+        for short, longs in expansions.items():
+            if len(longs) == 1:
+                union(longs[0], short, a_wins=True)
+
+        # Typos, compared only between tags sharing a one-character deletion, which every
+        # pair one edit apart does, to avoid comparing every pair
+        blocks = defaultdict(list)
+        for name in names:
+            if len(name) >= FUZZY_MIN_LENGTH:
+                for key in deletions(name):
+                    blocks[key].append(name)
+        for block in blocks.values():
+            for i, a in enumerate(block):
+                for b in block[i + 1:]:
+                    if find(a) != find(b) and typo_variants(a, b):
+                        union(a, b)
+
+        added = 0
+        for name in names:
+            root = find(name)
+            if root != name and self.aliases.get(name) != root:
+                self.aliases[name] = root
+                added += 1
+        return added
+
+    def save(self, path=VOCABULARY_FILE):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"tags": self.tags, "aliases": self.aliases}, f, indent=2, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path=VOCABULARY_FILE):
+        """Load a saved vocabulary, or start an empty one if path does not exist."""
+        if not os.path.exists(path):
+            return cls()
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["tags"], data["aliases"])
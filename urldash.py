@@ -0,0 +1,43 @@
+import sys
+import argparse
+import importlib
+
+# Subcommand -> (module, description). Modules are imported only when their
+# command runs, so `urldash.py --help` and light commands never load pandas,
+# requests, BeautifulSoup, PyPDF2 or the OpenAI client.
+COMMANDS = {
+    "arxiv": ("arxiv", "Fetch arXiv metadata for the arXiv bookmarks."),
+    "arxiv-tags": ("process_json_tags", "Map arXiv categories to tags."),
+    "download": ("generic", "Download the non-arXiv bookmarks."),
+    "hosts": ("fetch_scheduler", "Show or reset the per-host fetch health."),
+    "extract": ("process_generic", "Extract title, author, date and text from the downloads."),
+    "dedup": ("dedup", "Detect near-duplicate resources before gpt annotation."),
+    "segment": ("segment_json", "Split the resources into segments for gpt."),
+    "gpt": ("gpt_process", "Annotate the segments with gpt."),
+    "merge": ("merge_processed", "Merge the processed segments."),
+    "dates": ("process_dates", "Reformat the dates in a JSON file."),
+    "normalize-tags": ("normalize_tags", "Normalize tags against the tag vocabulary."),
+    "convert": ("convert_to_csv", "Convert the merged records to CSV and Parquet."),
+    "index": ("bookmark_index", "Build and query the bookmark index."),
+    "benchmark": ("benchmark", "Benchmark the pipeline stages against a local stub server."),
+}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="urldash.py",
+        description="Bookmark pipeline. Run 'urldash.py <command> --help' for the options of a command.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="commands:\n" + "\n".join(f"  {name:16s}{description}" for name, (_, description) in COMMANDS.items()),
+    )
+    parser.add_argument("command", choices=COMMANDS, metavar="command", help="One of the commands below.")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    module_name, _ = COMMANDS[args.command]
+    module = importlib.import_module(module_name)
+    # So the command's own argparse usage reads "urldash.py <command>"
+    sys.argv[0] = f"urldash.py {args.command}"
+    return module.main(args.args)
+
+if __name__ == "__main__":
+    sys.exit(main())